@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings):
+    """Фоновые задачи core.jobs выполняются в тестах сразу."""
+    settings.JOBS_EAGER = True
@@ -0,0 +1,27 @@
+"""Компактное представление постов и комментариев для API."""
+
+
+def _image_url(request, post):
+    if not post.image:
+        return None
+    return request.build_absolute_uri(post.image.url)
+
+
+def post_data(request, post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': _image_url(request, post),
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+        'author': comment.author.username,
+    }
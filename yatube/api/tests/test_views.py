@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import ENTRIES_PER_PAGE
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=True)
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Dmitriy')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Title',
+            slug='test_slug',
+            description='Description',
+        )
+        for i in range(ENTRIES_PER_PAGE + 1):
+            Post.objects.create(
+                text=f'Post number {i}',
+                author=cls.user,
+                group=cls.group,
+            )
+        cls.post = Post.objects.latest('pk')
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Hi')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = (
+            reverse('api:posts'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse(
+                'api:profile_posts', kwargs={'username': self.user.username}
+            ),
+            reverse('api:follow_posts'),
+        )
+
+    def test_feed_payload_and_cursor(self):
+        """Ленты отдают компактные посты и ссылку на следующую страницу."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                data = self.authorized_client.get(url).json()
+                self.assertEqual(len(data['results']), ENTRIES_PER_PAGE)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': self.user.username,
+                    'group': self.group.slug,
+                    'image': None,
+                })
+                self.assertIsNone(data['previous'])
+                rest = self.authorized_client.get(data['next']).json()
+                self.assertEqual(
+                    [post['text'] for post in rest['results']],
+                    ['Post number 0'],
+                )
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший If-None-Match — 304 без выборки страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                etag = response['ETag']
+                self.assertTrue(etag.startswith('"'))
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                for query in queries.captured_queries:
+                    self.assertNotIn('"posts_post"."text"', query['sql'])
+
+    def test_etag_changes_with_feed(self):
+        """Правка поста меняет ETag всех лент, где он выводится."""
+        etags = [self.authorized_client.get(url)['ETag'] for url in self.urls]
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Edited'
+        post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['text'],
+                                 'Edited')
+
+    def test_follow_etag_changes_with_subscriptions(self):
+        """Отписка меняет ETag ленты подписок."""
+        url = reverse('api:follow_posts')
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_follow_etag_does_not_scale_with_subscriptions(self):
+        """Проверка ETag ленты подписок не зависит от числа авторов."""
+        url = reverse('api:follow_posts')
+
+        def revalidate():
+            etag = self.authorized_client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+            self.assertEqual(response.status_code, 304)
+            return len(queries)
+
+        before = revalidate()
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(revalidate(), before)
+
+    def test_follow_is_private(self):
+        response = self.authorized_client.get(reverse('api:follow_posts'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_follow_requires_login(self):
+        response = self.guest_client.get(reverse('api:follow_posts'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_post_and_comments(self):
+        """Пост и его комментарии отдаются с валидаторами."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.json()['id'], self.post.pk)
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304,
+        )
+        url = reverse('api:post_comments', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.json()['results'][0]['author'], 'Reader')
+        etag = response['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Yo')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_unknown_objects(self):
+        urls = (
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile_posts', kwargs={'username': 'missing'}),
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:post_comments', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
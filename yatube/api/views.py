@@ -0,0 +1,177 @@
+"""Read-only JSON API лент.
+
+Ленты собираются теми же querysets и ``KeysetPaginator``, что и HTML.
+ETag строится из поколений кэша лент (``posts.cache``) и адреса запроса,
+поэтому на совпавший ``If-None-Match`` ответ 304 уходит до выборки
+страницы и сериализации. ``Last-Modified`` не ставится: правка
+и удаление поста не меняют ``pub_date``, и по ``If-Modified-Since``
+клиент получал бы устаревший 304.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.views.decorators.http import require_safe
+from yatube.settings import ENTRIES_PER_PAGE
+
+from posts import cache as feed_cache
+from posts.models import (TIMELINE_ORDERING, Comment, Group, Post,
+                          TimelineEntry)
+from posts.paginators import KeysetPaginator
+
+from .serializers import comment_data, post_data
+
+User = get_user_model()
+
+# Меняется вместе с форматом ответа, чтобы старые ETag не совпали.
+API_VERSION = 2
+
+
+def _etag(request, *parts):
+    payload = repr((API_VERSION, request.get_full_path(), parts))
+    return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def _conditional(request, etag, build):
+    """Отвечает 304/412 по ETag или строит ответ через ``build``."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    return response
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(f'{request.path}?cursor={cursor}')
+
+
+def _page_data(request, queryset, serialize, ordering=None):
+    paginator = KeysetPaginator(queryset, ENTRIES_PER_PAGE, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(obj) for obj in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    }
+
+
+def _feed(request, posts, feeds, newest, ordering=None):
+    versions = feed_cache.get_versions(feed_cache.SITE, *feeds)
+    newest = newest.aggregate(newest=Max('pub_date'))['newest']
+    return _conditional(
+        request,
+        _etag(request, newest, *versions),
+        lambda: _page_data(
+            request, posts, lambda post: post_data(request, post), ordering
+        ),
+    )
+
+
+@require_safe
+def index(request):
+    return _feed(
+        request,
+        Post.objects.for_feed(),
+        [feed_cache.INDEX],
+        Post.objects.all(),
+    )
+
+
+@require_safe
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _error('Группа не найдена', 404)
+    return _feed(
+        request,
+        group.posts.for_feed(),
+        [feed_cache.group_feed(group.pk)],
+        group.posts.all(),
+    )
+
+
+@require_safe
+def profile_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _error('Пользователь не найден', 404)
+    return _feed(
+        request,
+        author.posts.for_feed(),
+        [feed_cache.profile_feed(author.pk)],
+        author.posts.all(),
+    )
+
+
+@require_safe
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', 401)
+    # Не поколения профилей всех авторов подписок, а O(1): новый пост
+    # подписки добавляет запись в ленту, подписка и отписка меняют
+    # поколение подписок, а правка и удаление поста — поколение INDEX.
+    newest = TimelineEntry.objects.filter(
+        user=request.user
+    ).values_list('post_id', flat=True).first()
+    versions = feed_cache.get_versions(
+        feed_cache.SITE,
+        feed_cache.INDEX,
+        feed_cache.follows(request.user.pk),
+    )
+    response = _conditional(
+        request,
+        _etag(request, newest, *versions),
+        lambda: _page_data(
+            request,
+            Post.objects.for_timeline(request.user),
+            lambda post: post_data(request, post),
+            TIMELINE_ORDERING,
+        ),
+    )
+    # Лента личная: общие кэши не должны отдавать её другим.
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, private=True)
+    return response
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = Post.objects.for_feed().filter(pk=post_id).first()
+    if post is None:
+        return _error('Пост не найден', 404)
+    # Правка поста увеличивает поколение ленты профиля автора.
+    versions = feed_cache.get_versions(
+        feed_cache.SITE, feed_cache.profile_feed(post.author_id)
+    )
+    return _conditional(
+        request,
+        _etag(request, *versions),
+        lambda: post_data(request, post),
+    )
+
+
+@require_safe
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', 404)
+    comments = Comment.objects.filter(post_id=post_id)
+    # Комментарии не редактируются: число и последний id меняются
+    # при любом добавлении или удалении.
+    state = comments.aggregate(count=Count('pk'), last=Max('pk'))
+    (site_version,) = feed_cache.get_versions(feed_cache.SITE)
+    return _conditional(
+        request,
+        _etag(request, site_version, state['count'], state['last']),
+        lambda: _page_data(
+            request, comments.select_related('author'), comment_data
+        ),
+    )
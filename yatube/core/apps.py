@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from yatube.settings import DB_HEALTH_CHECKS
+
+        from .db import check_connections, configure_sqlite
+        connection_created.connect(configure_sqlite)
+        if DB_HEALTH_CHECKS:
+            request_started.connect(check_connections)
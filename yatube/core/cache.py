@@ -0,0 +1,368 @@
+"""Общий для всех процессов хоста кэш в файле SQLite.
+
+``LocMemCache`` живёт в памяти процесса: у каждого воркера gunicorn свой
+кэш, фрагменты лент строятся в каждом заново, а сброс поколения
+в одном воркере не виден остальным. ``SQLiteCache`` хранит записи
+в отдельном файле SQLite (не в основной базе, чтобы не делить с ней
+блокировку записи) в режиме WAL: читатели не ждут писателя,
+а ``incr`` атомарен между процессами.
+
+Размер ограничен числом записей (``MAX_ENTRIES``) и байтами
+(``MAX_SIZE``); при превышении сначала удаляются просроченные записи,
+затем давно не читанные (LRU) — с запасом в ``1 / CULL_FREQUENCY``
+лимита, как у встроенных бэкендов Django, чтобы следующие записи
+не упирались в лимит снова. Время последнего чтения и счётчики
+попаданий копятся в процессе и сбрасываются в файл пачкой,
+чтобы чтение из кэша не превращалось в запись.
+"""
+import contextlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# RETURNING в SQLite появился в 3.35.
+SQLITE_RETURNING_VERSION = (3, 35, 0)
+# Как часто сбрасывать в файл время чтения и счётчики процесса.
+FLUSH_INTERVAL = 1.0
+FLUSH_TOUCHES = 200
+STATS = ('hits', 'misses', 'evictions', 'entries', 'bytes')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL,'
+    ' size INTEGER NOT NULL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    ' name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5.0)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._pending = {'hits': 0, 'misses': 0}
+        self._flushed_at = time.monotonic()
+
+    # Соединения.
+
+    def _db(self):
+        # Соединение открывается лениво в каждом потоке и заново после
+        # fork: дочерний процесс не должен писать в соединение родителя.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.db = self._connect()
+            self._local.pid = pid
+        return self._local.db
+
+    def _connect(self):
+        directory = os.path.dirname(self._location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(
+            self._location, timeout=self._busy_timeout, isolation_level=None
+        )
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        with self._transaction(db):
+            for statement in SCHEMA:
+                db.execute(statement)
+            db.executemany(
+                'INSERT OR IGNORE INTO cache_stats VALUES (?, 0)',
+                [(name,) for name in STATS],
+            )
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self, db=None):
+        # IMMEDIATE сразу берёт блокировку записи: чтение и запись внутри
+        # транзакции не разорвёт писатель из другого процесса.
+        db = db or self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    # Учёт размера и вытеснение.
+
+    def _change_stats(self, db, **deltas):
+        db.executemany(
+            'UPDATE cache_stats SET value = value + ? WHERE name = ?',
+            [(delta, name) for name, delta in deltas.items() if delta],
+        )
+
+    def _store(self, db, key, value, timeout, now):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(blob) + len(key)
+        row = db.execute(
+            'SELECT size FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, blob, self.get_backend_timeout(timeout), size, now),
+        )
+        if row is None:
+            self._change_stats(db, entries=1, bytes=size)
+        else:
+            self._change_stats(db, bytes=size - row[0])
+
+    def _delete_row(self, db, key):
+        """Удаляет запись и возвращает ``(size,)`` или None.
+
+        Вызывается внутри ``BEGIN IMMEDIATE``, поэтому без RETURNING
+        SELECT и DELETE не разорвёт писатель из другого процесса.
+        """
+        if sqlite3.sqlite_version_info >= SQLITE_RETURNING_VERSION:
+            return db.execute(
+                'DELETE FROM cache WHERE key = ? RETURNING size', (key,)
+            ).fetchone()
+        row = db.execute(
+            'SELECT size FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is not None:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+        return row
+
+    def _remove(self, db, keys):
+        removed = 0
+        for key in keys:
+            row = self._delete_row(db, key)
+            if row is not None:
+                removed += 1
+                self._change_stats(db, entries=-1, bytes=-row[0])
+        return removed
+
+    def _totals(self, db):
+        return dict(db.execute(
+            "SELECT name, value FROM cache_stats "
+            "WHERE name IN ('entries', 'bytes')"
+        ).fetchall())
+
+    def _over_limit(self, totals):
+        return (totals['entries'] > self._max_entries
+                or totals['bytes'] > self._max_size)
+
+    def _cull_limits(self):
+        # CULL_FREQUENCY = 0, как и у бэкендов Django, очищает кэш целиком.
+        if not self._cull_frequency:
+            return 0, 0
+        return (
+            self._max_entries - self._max_entries // self._cull_frequency,
+            self._max_size - self._max_size // self._cull_frequency,
+        )
+
+    def _evict(self, db, now):
+        totals = self._totals(db)
+        if not self._over_limit(totals):
+            return
+        expired = [key for key, in db.execute(
+            'SELECT key FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )]
+        self._remove(db, expired)
+        totals = self._totals(db)
+        if not self._over_limit(totals):
+            return
+        max_entries, max_size = self._cull_limits()
+        victims = []
+        entries, size = totals['entries'], totals['bytes']
+        rows = db.execute(
+            'SELECT key, size FROM cache ORDER BY accessed'
+        )
+        for key, row_size in rows:
+            if entries <= max_entries and size <= max_size:
+                break
+            victims.append(key)
+            entries -= 1
+            size -= row_size
+        rows.close()
+        self._change_stats(db, evictions=self._remove(db, victims))
+
+    # Время чтения и счётчики процесса.
+
+    def _record(self, hits=(), misses=0):
+        now = time.time()
+        with self._lock:
+            for key in hits:
+                self._touched[key] = now
+            self._pending['hits'] += len(hits)
+            self._pending['misses'] += misses
+            due = (len(self._touched) >= FLUSH_TOUCHES
+                   or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL)
+        if due:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            pending = self._pending
+            self._pending = {'hits': 0, 'misses': 0}
+            self._flushed_at = time.monotonic()
+        with self._transaction() as db:
+            db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in touched.items()],
+            )
+            self._change_stats(db, **pending)
+
+    # API кэша Django.
+
+    def _read(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db().execute(
+            f'SELECT key, value, expires FROM cache '
+            f'WHERE key IN ({placeholders})',
+            list(keys),
+        ).fetchall()
+        now = time.time()
+        found = {
+            key: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+        self._record(hits=list(found), misses=len(keys) - len(found))
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        return {
+            made[key]: value for key, value in self._read(list(made)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            self._store(db, key, value, timeout, now)
+            self._evict(db, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._transaction() as db:
+            for key, value in data.items():
+                key = self.make_key(key, version=version)
+                self.validate_key(key)
+                self._store(db, key, value, timeout, now)
+            self._evict(db, now)
+        return []
+
+    def _live_row(self, db, key, now):
+        return db.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, now),
+        ).fetchone()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            if self._live_row(db, key, now) is not None:
+                return False
+            self._store(db, key, value, timeout, now)
+            self._evict(db, now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            row = self._live_row(db, key, now)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            old_size = db.execute(
+                'SELECT size FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (blob, len(blob) + len(key), key),
+            )
+            self._change_stats(db, bytes=len(blob) + len(key) - old_size)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            updated = db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, now),
+            ).rowcount
+        return bool(updated)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._live_row(self._db(), key, time.time()) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as db:
+            self._remove(db, [key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        with self._transaction() as db:
+            self._remove(db, keys)
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+            db.execute(
+                "UPDATE cache_stats SET value = 0 "
+                "WHERE name IN ('entries', 'bytes')"
+            )
+        with self._lock:
+            self._touched = {}
+
+    def close(self, **kwargs):
+        # Соединение остаётся открытым между запросами: открывать файл
+        # на каждый запрос дороже, чем держать его.
+        pass
+
+    def stats(self):
+        """Попадания, промахи и вытеснения всех процессов хоста."""
+        self._flush()
+        values = dict(self._db().execute(
+            'SELECT name, value FROM cache_stats'
+        ).fetchall())
+        lookups = values['hits'] + values['misses']
+        values.update(
+            max_entries=self._max_entries,
+            max_bytes=self._max_size,
+            hit_rate=round(values['hits'] / lookups, 4) if lookups else None,
+        )
+        return values
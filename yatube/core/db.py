@@ -0,0 +1,31 @@
+"""Настройка соединений с базой.
+
+``configure_sqlite`` включает для каждого нового соединения SQLite
+прагмы из ``SQLITE_PRAGMAS``: WAL, чтобы читатели не блокировали
+писателя, ``synchronous=NORMAL`` — fsync только на контрольных точках,
+mmap для чтения и ``busy_timeout``, чтобы конкурирующий писатель ждал
+блокировку, а не падал с «database is locked».
+
+``check_connections`` — проверка постоянных соединений
+(``CONN_MAX_AGE``) в начале запроса: соединение, которое сервер базы
+успел закрыть, отбрасывается до того, как на нём упадёт запрос.
+Проверка стоит запроса к базе на каждый HTTP-запрос, поэтому
+обработчик подключается, только если задан ``DB_HEALTH_CHECKS=1``.
+"""
+from django.db import connections
+
+from yatube.settings import SQLITE_PRAGMAS
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
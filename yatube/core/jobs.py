@@ -0,0 +1,197 @@
+"""Фоновые задачи в таблице ``core.Job`` без внешнего брокера.
+
+Функция становится задачей через декоратор ``task``; ``f.delay(...)``
+(или ``enqueue``) записывает строку ``Job`` в той же транзакции, что и
+данные, которые задача обработает: воркеры увидят её ровно в момент
+фиксации, а откат транзакции отменит и задачу. Задачу с ключом ``key``
+нельзя поставить второй раз, пока первая ждёт или выполняется; задача,
+которая ставит саму себя под своим же ключом, попадает в очередь после
+того, как её текущая строка удалена.
+
+Задачи выполняет команда ``run_workers``: воркеры забирают готовые
+строки (``claim``), выполненные удаляют, а упавшие откладывают
+с удвоением паузы, пока не кончатся попытки; после этого строка
+остаётся в состоянии ``failed`` с текстом ошибки.
+
+При ``JOBS_EAGER`` задача выполняется сразу в вызывающем коде, как
+раньше без очереди. Режим включается только явно и читается при каждом
+вызове, поэтому тесты переключают его через ``override_settings``.
+"""
+import functools
+import json
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from yatube.settings import (JOBS_LOCK_TIMEOUT, JOBS_MAX_ATTEMPTS,
+                             JOBS_POLL_INTERVAL, JOBS_RETRY_DELAY)
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Сколько готовых задач просматривается за одну попытку взять задачу.
+CLAIM_BATCH = 10
+# Пауза перед повтором не растёт дольше суток.
+MAX_RETRY_DELAY = 24 * 60 * 60
+
+# Ключ задачи, которую выполняет поток, и задачи, отложенные до её конца.
+_current = threading.local()
+
+
+class Task:
+    """Функция, которую можно выполнить в фоне: ``f.delay(*args)``."""
+
+    def __init__(self, func, max_attempts):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        enqueue(self, args, kwargs)
+
+
+def task(func=None, *, max_attempts=JOBS_MAX_ATTEMPTS):
+    """Декоратор задачи; аргументы задачи должны сериализоваться в JSON."""
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    return Task(func, max_attempts)
+
+
+def is_eager():
+    return settings.JOBS_EAGER
+
+
+def enqueue(task, args=(), kwargs=None, key=None, countdown=0):
+    """Ставит задачу в очередь (или выполняет сразу при ``JOBS_EAGER``)."""
+    kwargs = kwargs or {}
+    if is_eager():
+        task(*args, **kwargs)
+        return
+    job = Job(
+        task=task.name,
+        arguments=json.dumps([list(args), kwargs]),
+        key=key,
+        max_attempts=task.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+    if key is not None and key == getattr(_current, 'key', None):
+        # Строка выполняемой задачи ещё running и держит ключ: вставка
+        # сейчас молча пропустилась бы.
+        _current.deferred.append(job)
+        return
+    # Ключ занят ждущей задачей — вставка молча пропускается.
+    Job.objects.bulk_create([job], ignore_conflicts=key is not None)
+
+
+def retry_delay(attempts):
+    return min(JOBS_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def release_stale(now=None):
+    """Возвращает в очередь задачи воркеров, завершившихся на полпути."""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=JOBS_LOCK_TIMEOUT),
+    ).update(status=Job.QUEUED, locked_at=None)
+
+
+def claim(now=None):
+    """Забирает одну готовую задачу или возвращает None.
+
+    Задачу помечает ``running`` условный UPDATE: из двух воркеров,
+    выбравших одну строку, её получит только один.
+    """
+    now = now or timezone.now()
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:CLAIM_BATCH]
+    for pk in ready:
+        taken = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+        if taken:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Выполняет задачу; удаляет её или откладывает до следующей попытки."""
+    _current.key, _current.deferred = job.key, []
+    try:
+        return _run(job)
+    finally:
+        deferred = _current.deferred
+        _current.key, _current.deferred = None, []
+        Job.objects.bulk_create(deferred, ignore_conflicts=True)
+
+
+def _run(job):
+    try:
+        args, kwargs = json.loads(job.arguments)
+        import_string(job.task).func(*args, **kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None, last_error=error
+            )
+            return False
+        logger.warning('Задача %s упала, повтор позже:\n%s', job, error)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED,
+            locked_at=None,
+            last_error=error,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            ),
+        )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи по очереди; число выполненных попыток."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        done += 1
+    return done
+
+
+def work(stop=None, poll=JOBS_POLL_INTERVAL, once=False):
+    """Цикл воркера: берёт задачи, пока не выставлен ``stop``.
+
+    ``once`` — выйти, как только готовых задач не останется.
+    """
+    stop = stop or threading.Event()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            release_stale()
+            job = claim()
+            if job is not None:
+                run(job)
+            elif once:
+                break
+            else:
+                stop.wait(poll)
+    finally:
+        connection.close()
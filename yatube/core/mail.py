@@ -0,0 +1,241 @@
+"""Исходящая почта через очередь писем (outbox).
+
+Письма не отправляются в запросе: ``queue`` записывает их в таблицу
+``core.OutboxMessage`` и ставит фоновую задачу ``send_outbox``
+(``core.jobs``). Задача забирает готовые письма пачками
+по ``MAIL_BATCH_SIZE`` и отправляет каждую пачку через одно соединение
+с почтовым бэкендом; отправленные строки удаляются, а пачка, на которой
+бэкенд упал, откладывается с удвоением паузы.
+
+Получателю уходит не больше ``MAIL_RATE_LIMIT`` писем
+за ``MAIL_RATE_WINDOW`` секунд; лишние ждут следующего окна. Строки
+дайджеста (``queue_digest``) копятся ``MAIL_DIGEST_INTERVAL`` секунд
+с первой из них и уходят получателю одним письмом.
+"""
+import logging
+import math
+import uuid
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from yatube.settings import (JOBS_LOCK_TIMEOUT, MAIL_BATCH_SIZE,
+                             MAIL_DIGEST_INTERVAL, MAIL_DIGEST_SUBJECT,
+                             MAIL_MAX_ATTEMPTS, MAIL_RATE_LIMIT,
+                             MAIL_RATE_WINDOW)
+
+from . import jobs
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 500
+
+
+def queue(subject, body, recipients, html_body='', from_email=None):
+    """Ставит письмо каждому из ``recipients`` в очередь."""
+    now = timezone.now()
+    OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(
+                recipient=recipient,
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                from_email=from_email or '',
+                send_after=now,
+            )
+            for recipient in recipients
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    _schedule()
+
+
+def queue_digest(items):
+    """Добавляет строки ``(получатель, текст)`` в дайджесты получателей."""
+    send_after = timezone.now() + timedelta(seconds=MAIL_DIGEST_INTERVAL)
+    created = OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(
+                recipient=recipient,
+                body=text,
+                digest=True,
+                send_after=send_after,
+            )
+            for recipient, text in items
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    if created:
+        _schedule(MAIL_DIGEST_INTERVAL)
+
+
+def _schedule(countdown=0):
+    # Срочная и отложенная задачи — под разными ключами, иначе ждущая
+    # отправки дайджеста задача задержала бы письмо для сброса пароля.
+    # Из самой send_outbox под тем же ключом задача ставится после
+    # удаления своей строки (core.jobs), а не теряется.
+    key = 'mail:send' if countdown <= 0 else 'mail:send-later'
+    jobs.enqueue(send_outbox, key=key, countdown=max(countdown, 0))
+
+
+def _release_stale(now):
+    OutboxMessage.objects.filter(
+        status=OutboxMessage.SENDING,
+        claimed_at__lt=now - timedelta(seconds=JOBS_LOCK_TIMEOUT),
+    ).update(status=OutboxMessage.PENDING, claim=None, claimed_at=None)
+
+
+def _claim(now):
+    """Забирает пачку готовых писем; дайджест получателя — целиком.
+
+    Строки помечаются меткой отправителя условным UPDATE, поэтому
+    два отправителя не возьмут одно письмо.
+    """
+    pending = OutboxMessage.objects.filter(status=OutboxMessage.PENDING)
+    single = list(pending.filter(
+        digest=False, send_after__lte=now
+    ).order_by('send_after', 'pk').values_list(
+        'pk', flat=True
+    )[:MAIL_BATCH_SIZE])
+    recipients = list(pending.filter(
+        digest=True, send_after__lte=now
+    ).order_by().values_list(
+        'recipient', flat=True
+    ).distinct()[:MAIL_BATCH_SIZE - len(single)])
+    if not single and not recipients:
+        return []
+    token = uuid.uuid4().hex
+    pending.filter(
+        Q(pk__in=single) | Q(digest=True, recipient__in=recipients)
+    ).update(status=OutboxMessage.SENDING, claim=token, claimed_at=now)
+    return list(
+        OutboxMessage.objects.filter(claim=token).order_by('created', 'pk')
+    )
+
+
+def _allowed(recipient, now):
+    """Учитывает письмо в окне получателя; False — лимит исчерпан."""
+    window = int(now.timestamp()) // MAIL_RATE_WINDOW
+    key = f'mail-rate:{window}:{recipient}'
+    cache.add(key, 0, MAIL_RATE_WINDOW)
+    try:
+        sent = cache.incr(key)
+    except ValueError:
+        # Ключ успели вытеснить между add и incr.
+        cache.set(key, 1, MAIL_RATE_WINDOW)
+        sent = 1
+    return sent <= MAIL_RATE_LIMIT
+
+
+def _next_window(now):
+    window = int(now.timestamp()) // MAIL_RATE_WINDOW
+    return datetime.fromtimestamp(
+        (window + 1) * MAIL_RATE_WINDOW, tz=timezone.utc
+    )
+
+
+def _message(members):
+    first = members[0]
+    if first.digest:
+        message = EmailMultiAlternatives(
+            MAIL_DIGEST_SUBJECT,
+            '\n\n'.join(member.body for member in members),
+            to=[first.recipient],
+        )
+    else:
+        message = EmailMultiAlternatives(
+            first.subject, first.body, first.from_email or None,
+            [first.recipient],
+        )
+        if first.html_body:
+            message.attach_alternative(first.html_body, 'text/html')
+    return message
+
+
+def _messages(rows):
+    """[(письмо, строки очереди)]; дайджест получателя — одно письмо."""
+    groups = []
+    digests = {}
+    for row in rows:
+        if not row.digest:
+            groups.append([row])
+        elif row.recipient in digests:
+            digests[row.recipient].append(row)
+        else:
+            digests[row.recipient] = [row]
+            groups.append(digests[row.recipient])
+    return [(_message(members), members) for members in groups]
+
+
+def _defer(rows, send_after, **fields):
+    OutboxMessage.objects.filter(pk__in=[row.pk for row in rows]).update(
+        status=OutboxMessage.PENDING, claim=None, claimed_at=None,
+        send_after=send_after, **fields
+    )
+
+
+def _fail(rows, now):
+    """Откладывает пачку после ошибки бэкенда или помечает неудачной."""
+    attempts = max(row.attempts for row in rows) + 1
+    if attempts >= MAIL_MAX_ATTEMPTS:
+        OutboxMessage.objects.filter(
+            pk__in=[row.pk for row in rows]
+        ).update(status=OutboxMessage.FAILED, claim=None, claimed_at=None)
+        return
+    _defer(
+        rows,
+        now + timedelta(seconds=jobs.retry_delay(attempts)),
+        attempts=attempts,
+    )
+
+
+def send_batch(now=None):
+    """Отправляет одну пачку; число отправленных писем или None."""
+    now = now or timezone.now()
+    rows = _claim(now)
+    if not rows:
+        return None
+    messages, sent_rows, limited = [], [], []
+    for message, members in _messages(rows):
+        if _allowed(message.to[0], now):
+            messages.append(message)
+            sent_rows.extend(members)
+        else:
+            limited.extend(members)
+    if limited:
+        _defer(limited, _next_window(now))
+    if not messages:
+        return 0
+    try:
+        # Одно соединение на пачку: send_messages открывает его один раз.
+        sent = get_connection().send_messages(messages)
+    except Exception:
+        logger.exception('Не удалось отправить пачку из %d писем',
+                         len(messages))
+        _fail(sent_rows, now)
+        return 0
+    OutboxMessage.objects.filter(
+        pk__in=[row.pk for row in sent_rows]
+    ).delete()
+    return sent or 0
+
+
+@jobs.task
+def send_outbox():
+    """Задача: отправляет все готовые письма и планирует следующие."""
+    now = timezone.now()
+    _release_stale(now)
+    while send_batch(now) is not None:
+        pass
+    next_at = OutboxMessage.objects.filter(
+        status=OutboxMessage.PENDING
+    ).aggregate(next_at=Min('send_after'))['next_at']
+    # В режиме JOBS_EAGER задача выполнилась бы тут же и снова не нашла
+    # готовых писем: отложенные письма ждут воркеров run_workers.
+    if next_at is not None and not jobs.is_eager():
+        _schedule(max(math.ceil((next_at - now).total_seconds()), 1))
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache.SQLiteCache',
+}
+FRAGMENT = 'x' * 20 * 1024
+RENDER_SECONDS = 0.005
+
+
+def make_cache(name, location):
+    return import_string(BACKENDS[name])(
+        location, {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    )
+
+
+def _ops_per_second(operation, count):
+    started = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return round(count / (time.perf_counter() - started))
+
+
+def single_process(name, location, count):
+    cache = make_cache(name, location)
+    cache.clear()
+    cache.set('counter', 0)
+    keys = [f'key:{i}' for i in range(100)]
+    for key in keys:
+        cache.set(key, FRAGMENT)
+    return {
+        'set': _ops_per_second(
+            lambda i: cache.set(keys[i % 100], FRAGMENT), count
+        ),
+        'get': _ops_per_second(lambda i: cache.get(keys[i % 100]), count),
+        'get_many': _ops_per_second(
+            lambda i: cache.get_many(keys[i % 90:i % 90 + 10]), count
+        ),
+        'incr': _ops_per_second(lambda i: cache.incr('counter'), count),
+    }
+
+
+def render_worker(name, location, pages, requests, seed):
+    """Воркер отдаёт случайные страницы ленты, строя фрагмент при промахе."""
+    cache = make_cache(name, location)
+    rng = random.Random(seed)
+    renders = 0
+    for _ in range(requests):
+        key = f'fragment:index:{rng.randrange(pages)}'
+        if cache.get(key) is None:
+            time.sleep(RENDER_SECONDS)
+            cache.set(key, FRAGMENT)
+            renders += 1
+    return renders
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает кэш в памяти процесса и общий кэш SQLite: скорость '
+        'операций и число построений фрагментов у нескольких воркеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        context = multiprocessing.get_context('spawn')
+        self.stdout.write(
+            f"{'кэш':<8}{'set/с':>9}{'get/с':>9}{'get_many/с':>12}"
+            f"{'incr/с':>9}{'построений':>12}{'время, с':>10}"
+        )
+        for name in BACKENDS:
+            location = os.path.join(directory, f'{name}.sqlite3')
+            ops = single_process(name, location, options['operations'])
+            make_cache(name, location).clear()
+            started = time.perf_counter()
+            with context.Pool(options['workers']) as pool:
+                renders = sum(pool.starmap(render_worker, [
+                    (name, location, options['pages'], options['requests'],
+                     seed)
+                    for seed in range(options['workers'])
+                ]))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{name:<8}{ops['set']:>9}{ops['get']:>9}"
+                f"{ops['get_many']:>12}{ops['incr']:>9}{renders:>12}"
+                f'{elapsed:>10.2f}'
+            )
@@ -0,0 +1,93 @@
+import multiprocessing
+import threading
+
+from django.core.management.base import BaseCommand
+from yatube.settings import JOBS_POLL_INTERVAL, JOBS_WORKERS
+
+
+def work_in_process(poll, once):
+    """Точка входа процесса воркера (контекст ``spawn``)."""
+    import django
+    django.setup()
+    from core import jobs
+    try:
+        jobs.work(poll=poll, once=once)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи core.jobs пулом потоков или процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=JOBS_WORKERS,
+            help='Число воркеров.',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Воркеры — процессы, а не потоки: для задач, '
+                 'занимающих процессор (миниатюры).',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=JOBS_POLL_INTERVAL,
+            help='Пауза между проверками пустой очереди, секунд.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        count = max(options['workers'], 1)
+        if options['processes']:
+            self._run_processes(count, options['poll'], options['once'])
+        else:
+            self._run_threads(count, options['poll'], options['once'])
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
+
+    def _run_threads(self, count, poll, once):
+        # Модуль загружается и в процессах воркеров до django.setup(),
+        # поэтому модели импортируются только здесь.
+        from core import jobs
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=jobs.work,
+                kwargs={'stop': stop, 'poll': poll, 'once': once},
+                name=f'job-worker-{i}',
+            )
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Текущие задачи дорабатывают, новые не берутся.
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _run_processes(self, count, poll, once):
+        # spawn, а не fork: процесс не должен унаследовать соединения
+        # с базой родителя.
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(
+                target=work_in_process, args=(poll, once),
+                name=f'job-worker-{i}',
+            )
+            for i in range(count)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Ctrl+C получает вся группа процессов: воркеры дорабатывают
+            # текущую задачу и выходят сами.
+            for process in processes:
+                process.join()
@@ -0,0 +1,210 @@
+"""Метрики запросов в памяти процесса и их выдача в формате Prometheus.
+
+``PerformanceMiddleware`` кладёт на время запроса ``RequestMetrics``
+в ``request.metrics`` и в локальное состояние потока: туда считают
+SQL-запросы (``connection.execute_wrapper``), время рендера шаблонов
+и любые другие участки (``timed``). По завершении запроса значения
+попадают в гистограммы ``registry`` с меткой имени представления.
+
+Гистограммы свои у каждого процесса; Prometheus собирает их
+с каждого воркера отдельно.
+"""
+import contextlib
+import functools
+import threading
+import time
+from collections import defaultdict
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        # Прочие участки: имя -> суммарное время в секундах.
+        self.timings = defaultdict(float)
+        self.active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_state, 'metrics', None)
+
+
+@contextlib.contextmanager
+def collect(metrics):
+    _state.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _state.metrics = None
+
+
+@contextlib.contextmanager
+def timed(name):
+    """Добавляет время блока к участку ``name`` текущего запроса.
+
+    Вложенные блоки с тем же именем не считаются второй раз.
+    """
+    metrics = current()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(name)
+        metrics.timings[name] += time.perf_counter() - started
+
+
+def instrument_method(cls, method, name):
+    """Оборачивает ``cls.method`` в ``timed(name)``, но только один раз."""
+    original = getattr(cls, method)
+    if getattr(original, 'instrumented', False):
+        return
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with timed(name):
+            return original(*args, **kwargs)
+
+    wrapper.instrumented = True
+    setattr(cls, method, wrapper)
+
+
+def instrument_templates():
+    """Считает время внешнего рендера шаблона (без вложенных include)."""
+    from django.template.backends.django import Template
+
+    original = Template.render
+    if getattr(original, 'instrumented', False):
+        return
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None or metrics.render_depth:
+            return original(self, context, request)
+        metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.render_depth -= 1
+            metrics.render_time += time.perf_counter() - started
+
+    render.instrumented = True
+    Template.render = render
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Histogram:
+    """Накопительная гистограмма Prometheus с одной меткой."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # Метка -> [счётчики по корзинам, сумма, число наблюдений].
+        self.series = {}
+
+    def observe(self, label, value):
+        series = self.series.setdefault(
+            label, [[0] * len(self.buckets), 0, 0]
+        )
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def exposition(self, label_name):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for label, (counts, total, count) in sorted(self.series.items()):
+            labels = f'{label_name}="{_escape(label)}"'
+            for bound, bucket in zip(self.buckets, counts):
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket}'
+                )
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Registry:
+    """Гистограммы процесса по имени представления."""
+
+    label = 'view'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {
+                'duration': Histogram(
+                    'yatube_request_duration_seconds',
+                    'Время обработки запроса.', DURATION_BUCKETS,
+                ),
+                'db_queries': Histogram(
+                    'yatube_db_queries',
+                    'SQL-запросов за запрос.', COUNT_BUCKETS,
+                ),
+                'db_time': Histogram(
+                    'yatube_db_query_duration_seconds',
+                    'Суммарное время SQL-запросов за запрос.',
+                    DURATION_BUCKETS,
+                ),
+                'render_time': Histogram(
+                    'yatube_template_render_seconds',
+                    'Время рендера шаблонов за запрос.', DURATION_BUCKETS,
+                ),
+                'response_size': Histogram(
+                    'yatube_response_size_bytes',
+                    'Размер тела ответа.', SIZE_BUCKETS,
+                ),
+            }
+
+    def observe(self, view, **values):
+        with self._lock:
+            for name, value in values.items():
+                self.histograms[name].observe(view, value)
+
+    def exposition(self):
+        with self._lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.exposition(self.label))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,125 @@
+"""Замер производительности каждого запроса.
+
+``PerformanceMiddleware`` стоит первым в ``MIDDLEWARE`` и считает для
+запроса время целиком, число и время SQL-запросов на всех соединениях,
+время рендера шаблонов и размер ответа (см. ``core.metrics``).
+Замеры уходят в гистограммы процесса с меткой имени представления,
+а запросы дольше ``PERF_SLOW_REQUEST_MS``, если он задан, пишутся
+в журнал ``yatube.performance``.
+
+С ``SERVER_TIMING`` ответы представлений ``posts.views`` получают
+заголовки ``Server-Timing`` (db, render, thumbnail, cache, total)
+и ``X-DB-Queries``. Замер кэша и миниатюр включается только вместе
+с заголовками, поэтому без них лишней работы в запросе нет.
+"""
+import contextlib
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import connections
+from django.utils.module_loading import import_string
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from yatube.settings import PERF_SLOW_REQUEST_MS, SERVER_TIMING
+
+from . import metrics
+
+logger = logging.getLogger('yatube.performance')
+
+CACHE_METHODS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'incr', 'touch',
+    'has_key', 'delete', 'delete_many',
+)
+SERVER_TIMING_VIEWS = 'posts.views'
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def instrument_server_timing():
+    """Замер времени кэша и нарезки миниатюр для ``Server-Timing``."""
+    for method in CACHE_METHODS:
+        metrics.instrument_method(type(caches['default']), method, 'cache')
+    metrics.instrument_method(
+        import_string(thumbnail_settings.THUMBNAIL_BACKEND),
+        'get_thumbnail', 'thumbnail',
+    )
+
+
+def server_timing(values, duration):
+    def entry(name, seconds, description=None):
+        value = f'{name};dur={seconds * 1000:.1f}'
+        if description:
+            value += f';desc="{description}"'
+        return value
+
+    return ', '.join((
+        entry('db', values.db_time, f'{values.db_queries} queries'),
+        entry('render', values.render_time),
+        entry('thumbnail', values.timings['thumbnail']),
+        entry('cache', values.timings['cache']),
+        entry('total', duration),
+    ))
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.instrument_templates()
+        if SERVER_TIMING:
+            instrument_server_timing()
+
+    def __call__(self, request):
+        request.metrics = metrics.RequestMetrics()
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(metrics.collect(request.metrics))
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(request.metrics)
+                )
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        self.record(request, response, duration)
+        if SERVER_TIMING and self._timed_view(request):
+            response['Server-Timing'] = server_timing(
+                request.metrics, duration
+            )
+            response['X-DB-Queries'] = str(request.metrics.db_queries)
+        return response
+
+    def _timed_view(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return (match is not None
+                and match.func.__module__ == SERVER_TIMING_VIEWS)
+
+    def record(self, request, response, duration):
+        view = _view_name(request)
+        values = request.metrics
+        observed = {
+            'duration': duration,
+            'db_queries': values.db_queries,
+            'db_time': values.db_time,
+            'render_time': values.render_time,
+        }
+        size = _response_size(response)
+        if size is not None:
+            observed['response_size'] = size
+        metrics.registry.observe(view, **observed)
+        if PERF_SLOW_REQUEST_MS and duration * 1000 >= PERF_SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+                'шаблоны %.0f мс, статус %d',
+                request.method, request.get_full_path(), view,
+                duration * 1000, values.db_queries, values.db_time * 1000,
+                values.render_time * 1000, response.status_code,
+            )
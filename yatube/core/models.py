@@ -13,3 +13,85 @@ class CreatedModel(models.Model):
         # Это абстрактная модель:
         abstract = True
         ordering = ['-pub_date']
+
+
+class Job(models.Model):
+    """Фоновая задача ``core.jobs``; выполненные задачи удаляются."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+    task = models.CharField('Задача', max_length=200)
+    # Аргументы в JSON: [args, kwargs].
+    arguments = models.TextField('Аргументы', default='[[], {}]')
+    # Ключ не даёт поставить в очередь вторую такую же задачу,
+    # пока первая не выполнена.
+    key = models.CharField('Ключ', max_length=255, null=True, blank=True)
+    status = models.CharField(
+        'Состояние', max_length=16, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Попыток не больше')
+    run_at = models.DateTimeField('Выполнить после')
+    locked_at = models.DateTimeField('Взята воркером', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='job_pending_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
+
+
+class OutboxMessage(models.Model):
+    """Письмо в очереди ``core.mail``; отправленные письма удаляются."""
+    PENDING = 'pending'
+    SENDING = 'sending'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт отправки'),
+        (SENDING, 'Отправляется'),
+        (FAILED, 'Не отправлено'),
+    )
+    recipient = models.EmailField('Получатель')
+    subject = models.CharField('Тема', max_length=255, blank=True)
+    body = models.TextField('Текст')
+    html_body = models.TextField('HTML', blank=True)
+    from_email = models.CharField('Отправитель', max_length=255, blank=True)
+    # Строки дайджеста одного получателя уходят одним письмом.
+    digest = models.BooleanField('Часть дайджеста', default=False)
+    status = models.CharField(
+        'Состояние', max_length=16, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    send_after = models.DateTimeField('Отправить после')
+    # Метка отправителя, забравшего письмо в свою пачку.
+    claim = models.CharField(max_length=32, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'send_after'], name='outbox_queue_idx'),
+            models.Index(
+                fields=['recipient', 'digest', 'status'],
+                name='outbox_digest_idx'),
+            models.Index(fields=['claim'], name='outbox_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
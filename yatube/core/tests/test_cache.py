@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..cache import SQLiteCache
+
+User = get_user_model()
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 'value'))
+        self.assertEqual(cache.get_many(['key', 'new', 'missing']),
+                         {'key': {'value': 1}, 'new': 'value'})
+        cache.set('counter', 1)
+        self.assertEqual(cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        cache.set('short', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.assertFalse(cache.has_key('short'))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому через общий файл."""
+        other = self.make_cache()
+        self.cache.set('feed-version:index', 1)
+        other.incr('feed-version:index')
+        self.assertEqual(self.cache.get('feed-version:index'), 2)
+
+    def test_lru_eviction_by_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache._flush()
+        cache.set('d', 'd')
+        self.assertEqual(
+            set(cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'd'}
+        )
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_cull_leaves_headroom(self):
+        """Вытесняется треть лимита, а не одна запись на каждый set."""
+        cache = self.make_cache(MAX_ENTRIES=9)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        self.assertEqual(cache.stats()['entries'], 6)
+        for i in range(10, 13):
+            cache.set(f'key{i}', i)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (9, 4))
+
+    def test_expired_lookup_uses_index(self):
+        plan = ' '.join(row[-1] for row in self.cache._db().execute(
+            'EXPLAIN QUERY PLAN SELECT key FROM cache '
+            'WHERE expires IS NOT NULL AND expires <= ?', (time.time(),)
+        ))
+        self.assertIn('cache_expires_idx', plan)
+
+    def test_size_cap(self):
+        cache = self.make_cache(MAX_SIZE=3000)
+        for i in range(5):
+            cache.set(f'key{i}', 'x' * 1000)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 3000)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_delete_without_returning(self):
+        """На SQLite старше 3.35 удаление обходится без RETURNING."""
+        with mock.patch('core.cache.SQLITE_RETURNING_VERSION', (99, 0, 0)):
+            cache = self.make_cache(MAX_ENTRIES=3)
+            for key in ('a', 'b', 'c', 'd'):
+                cache.set(key, key)
+            cache.delete('d')
+            stats = cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], 2)
+
+    def test_stats(self):
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+class CacheStatsViewTests(TestCase):
+    def test_staff_only(self):
+        url = reverse('core:cache_stats')
+        client = Client()
+        client.force_login(User.objects.create_user(username='user'))
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(
+            User.objects.create_user(username='admin', is_staff=True)
+        )
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['backend'], 'core.cache.SQLiteCache')
+        self.assertIn('evictions', response.json())
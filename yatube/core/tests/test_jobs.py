@@ -0,0 +1,189 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post, TimelineEntry
+
+from .. import jobs
+from ..models import Job
+
+User = get_user_model()
+
+calls = []
+
+
+@jobs.task
+def record(value, suffix=''):
+    calls.append(f'{value}{suffix}')
+
+
+@jobs.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_stores_job(self):
+        record.delay('a', suffix='!')
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'core.tests.test_jobs.record')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, ['a!'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_rollback_drops_job(self):
+        """Задача из откатившейся транзакции не выполняется."""
+        with transaction.atomic():
+            record.delay('lost')
+            transaction.set_rollback(True)
+        self.assertFalse(Job.objects.exists())
+
+    def test_key_deduplicates_pending_jobs(self):
+        jobs.enqueue(record, ['x'], key='same')
+        jobs.enqueue(record, ['x'], key='same')
+        self.assertEqual(Job.objects.count(), 1)
+        jobs.run_pending()
+        jobs.enqueue(record, ['x'], key='same')
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_countdown(self):
+        jobs.enqueue(record, ['later'], countdown=60)
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), 1)
+
+    def test_retry_with_backoff_then_fail(self):
+        explode.delay()
+        with self.assertLogs('core.jobs', 'WARNING'):
+            jobs.run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(
+            job.run_at,
+            timezone.now() + timedelta(seconds=jobs.retry_delay(1) - 5),
+        )
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay_doubles(self):
+        self.assertEqual(
+            [jobs.retry_delay(n) for n in (1, 2, 3)],
+            [jobs.JOBS_RETRY_DELAY * 1, jobs.JOBS_RETRY_DELAY * 2,
+             jobs.JOBS_RETRY_DELAY * 4],
+        )
+        self.assertEqual(jobs.retry_delay(100), jobs.MAX_RETRY_DELAY)
+
+    def test_claim_takes_job_once(self):
+        record.delay('once')
+        job = jobs.claim()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertIsNone(jobs.claim())
+
+    def test_stale_jobs_released(self):
+        record.delay('stale')
+        jobs.claim()
+        self.assertEqual(jobs.release_stale(), 0)
+        later = timezone.now() + timedelta(seconds=jobs.JOBS_LOCK_TIMEOUT + 1)
+        self.assertEqual(jobs.release_stale(later), 1)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_eager_runs_inline(self):
+        with override_settings(JOBS_EAGER=True):
+            record.delay('now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(JOBS_EAGER=False)
+class DeferredSideEffectsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_post_create_defers_fan_out(self):
+        """Публикация не раскладывает пост по лентам в запросе."""
+        reader = Client()
+        reader.force_login(self.reader)
+        reader.get(reverse('posts:profile_follow', args=['author']))
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        post = Post.objects.get()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            set(Job.objects.values_list('task', flat=True)),
+            {
+                'posts.timeline.backfill_authors',
+                'posts.timeline.deliver_post',
+                'posts.fulltext.reindex_post',
+            },
+        )
+        jobs.run_pending()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(self.reader.pk, post.pk)],
+        )
+
+    def test_follow_defers_backfill(self):
+        """Подписка не переносит старые посты автора в ленту в запросе."""
+        post = Post.objects.create(author=self.author, text='Старый')
+        jobs.run_pending()
+        reader = Client()
+        reader.force_login(self.reader)
+        reader.get(reverse('posts:profile_follow', args=['author']))
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            list(Job.objects.values_list('task', flat=True)),
+            ['posts.timeline.backfill_authors'],
+        )
+        jobs.run_pending()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(self.reader.pk, post.pk)],
+        )
+
+    def test_add_comment_defers_indexing(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        jobs.run_pending()
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Ответ'}
+        )
+        self.assertEqual(
+            list(Job.objects.values_list('task', flat=True)),
+            ['posts.fulltext.reindex_comment'],
+        )
+
+
+@override_settings(JOBS_EAGER=False)
+class RunWorkersTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_workers_drain_queue(self):
+        for value in range(5):
+            record.delay(value)
+        out = StringIO()
+        call_command('run_workers', '--once', '--workers', '2', stdout=out)
+        self.assertEqual(sorted(calls), ['0', '1', '2', '3', '4'])
+        self.assertFalse(Job.objects.exists())
+        self.assertIn('Воркеры остановлены', out.getvalue())
@@ -0,0 +1,162 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail as django_mail
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Post
+
+from .. import jobs, mail
+from ..models import Job, OutboxMessage
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=False)
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _later(self, seconds):
+        return timezone.now() + timedelta(seconds=seconds)
+
+    def test_queue_sends_outside_request(self):
+        mail.queue('Тема', 'Текст', ['a@example.com', 'b@example.com'])
+        self.assertEqual(django_mail.outbox, [])
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertEqual(
+            list(Job.objects.values_list('task', 'key')),
+            [('core.mail.send_outbox', 'mail:send')],
+        )
+        jobs.run_pending()
+        self.assertEqual(
+            sorted(message.to[0] for message in django_mail.outbox),
+            ['a@example.com', 'b@example.com'],
+        )
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_one_connection_per_batch(self):
+        mail.queue('Тема', 'Текст', [f'u{i}@example.com' for i in range(5)])
+        with mock.patch('core.mail.MAIL_BATCH_SIZE', 3), \
+                mock.patch('core.mail.get_connection',
+                           wraps=mail.get_connection) as connection:
+            mail.send_outbox()
+        self.assertEqual(connection.call_count, 2)
+        self.assertEqual(len(django_mail.outbox), 5)
+
+    def test_rate_limit_per_recipient(self):
+        mail.queue('Тема', 'Текст', ['a@example.com'] * 3)
+        mail.queue('Тема', 'Текст', ['b@example.com'])
+        with mock.patch('core.mail.MAIL_RATE_LIMIT', 2):
+            mail.send_outbox()
+        self.assertEqual(
+            sorted(message.to[0] for message in django_mail.outbox),
+            ['a@example.com', 'a@example.com', 'b@example.com'],
+        )
+        deferred = OutboxMessage.objects.get()
+        self.assertEqual(deferred.status, OutboxMessage.PENDING)
+        self.assertGreater(deferred.send_after, timezone.now())
+        # Следующая отправка запланирована на начало нового окна.
+        self.assertTrue(Job.objects.filter(key='mail:send-later').exists())
+
+    def test_worker_reschedules_under_own_key(self):
+        """Задача mail:send-later из воркера планирует следующую."""
+        mail.queue_digest([('a@example.com', 'Пост')])
+        Job.objects.update(run_at=timezone.now())
+        job = jobs.claim()
+        self.assertEqual(job.key, 'mail:send-later')
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(django_mail.outbox, [])
+        rescheduled = Job.objects.get()
+        self.assertEqual(
+            (rescheduled.key, rescheduled.status),
+            ('mail:send-later', Job.QUEUED),
+        )
+        self.assertGreaterEqual(
+            rescheduled.run_at, OutboxMessage.objects.get().send_after
+        )
+
+    def test_digest_groups_notifications(self):
+        mail.queue_digest([
+            ('a@example.com', 'Первый пост'),
+            ('a@example.com', 'Второй пост'),
+            ('b@example.com', 'Третий пост'),
+        ])
+        mail.send_outbox()
+        self.assertEqual(django_mail.outbox, [])
+        OutboxMessage.objects.filter(body='Первый пост').update(
+            send_after=timezone.now()
+        )
+        mail.send_outbox()
+        self.assertEqual(len(django_mail.outbox), 1)
+        message = django_mail.outbox[0]
+        self.assertEqual(message.to, ['a@example.com'])
+        self.assertEqual(message.subject, mail.MAIL_DIGEST_SUBJECT)
+        self.assertIn('Первый пост', message.body)
+        self.assertIn('Второй пост', message.body)
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list('recipient', flat=True)),
+            ['b@example.com'],
+        )
+
+    def test_failed_batch_is_retried_then_failed(self):
+        mail.queue('Тема', 'Текст', ['a@example.com'])
+        broken = mock.patch(
+            'core.mail.get_connection',
+            return_value=mock.Mock(
+                send_messages=mock.Mock(side_effect=OSError('down'))
+            ),
+        )
+        with broken, self.assertLogs('core.mail', 'ERROR'):
+            mail.send_outbox()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, OutboxMessage.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.send_after, timezone.now())
+        OutboxMessage.objects.update(attempts=mail.MAIL_MAX_ATTEMPTS - 1,
+                                     send_after=timezone.now())
+        with broken, self.assertLogs('core.mail', 'ERROR'):
+            mail.send_outbox()
+        self.assertEqual(
+            OutboxMessage.objects.get().status, OutboxMessage.FAILED
+        )
+
+    def test_password_reset_goes_through_outbox(self):
+        User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        response = Client().post(
+            reverse('users:password_reset'), {'email': 'reader@example.com'}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(django_mail.outbox, [])
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.recipient, 'reader@example.com')
+        self.assertNotIn('\n', message.subject)
+        self.assertIn('/auth/reset/', message.body)
+        jobs.run_pending()
+        self.assertEqual(django_mail.outbox[0].to, ['reader@example.com'])
+
+    def test_new_post_notifies_followers_in_digest(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        silent = User.objects.create_user(username='silent')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=silent, author=author)
+        for text in ('Первый', 'Второй'):
+            post = Post.objects.create(author=author, text=text)
+        jobs.run_pending()
+        rows = OutboxMessage.objects.filter(digest=True)
+        self.assertEqual(
+            set(rows.values_list('recipient', flat=True)),
+            {'reader@example.com'},
+        )
+        self.assertEqual(rows.count(), 2)
+        self.assertIn(post.get_absolute_url(), rows.last().body)
+        self.assertEqual(django_mail.outbox, [])
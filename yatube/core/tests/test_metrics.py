@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import registry
+
+User = get_user_model()
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+
+    def test_request_is_measured(self):
+        response = self.client.get(reverse('posts:main_page'))
+        metrics = response.wsgi_request.metrics
+        self.assertGreater(metrics.db_queries, 0)
+        self.assertGreater(metrics.render_time, 0)
+        histograms = registry.histograms
+        for name in ('duration', 'db_queries', 'db_time', 'render_time',
+                     'response_size'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    histograms[name].series['posts:main_page'][2], 1
+                )
+        self.assertEqual(
+            histograms['response_size'].series['posts:main_page'][1],
+            len(response.content),
+        )
+
+    def test_exposition(self):
+        self.client.get(reverse('posts:main_page'))
+        self.client.get('/missing-page/')
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn(
+            'yatube_db_queries_count{view="posts:main_page"} 1', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="unresolved"} 1',
+            text,
+        )
+
+    def test_metrics_access(self):
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with mock.patch('core.views.METRICS_TOKEN', 'secret'):
+            self.assertEqual(
+                self.client.get(
+                    url, HTTP_AUTHORIZATION='Bearer wrong'
+                ).status_code,
+                403,
+            )
+            self.assertEqual(
+                self.client.get(
+                    url, HTTP_AUTHORIZATION='Bearer secret'
+                ).status_code,
+                200,
+            )
+
+    def test_slow_request_logged(self):
+        with mock.patch('core.middleware.PERF_SLOW_REQUEST_MS', 0.001):
+            with self.assertLogs('yatube.performance', 'WARNING') as logs:
+                self.client.get(reverse('posts:main_page'))
+        self.assertIn('posts:main_page', logs.output[0])
+
+    def test_slow_log_off_by_default(self):
+        with mock.patch('core.middleware.PERF_SLOW_REQUEST_MS', 0):
+            with self.assertNoLogs('yatube.performance', 'WARNING'):
+                self.client.get(reverse('posts:main_page'))
+
+    def test_fast_request_not_logged(self):
+        with mock.patch('core.middleware.PERF_SLOW_REQUEST_MS', 10 ** 6):
+            with self.assertNoLogs('yatube.performance', 'WARNING'):
+                self.client.get(reverse('posts:main_page'))
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def get(self, url):
+        # Посредник создаётся заново обработчиком каждого клиента.
+        return Client().get(url)
+
+    def test_headers_on_posts_views(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        with mock.patch('core.middleware.SERVER_TIMING', True):
+            response = self.get(url)
+        timing = response['Server-Timing']
+        for name in ('db', 'render', 'thumbnail', 'cache', 'total'):
+            with self.subTest(name=name):
+                self.assertRegex(timing, rf'(^|, ){name};dur=\d+\.\d')
+        queries = response.wsgi_request.metrics.db_queries
+        self.assertEqual(response['X-DB-Queries'], str(queries))
+        self.assertIn(f'desc="{queries} queries"', timing)
+
+    def test_cache_time_measured(self):
+        with mock.patch('core.middleware.SERVER_TIMING', True):
+            response = self.get(reverse('posts:main_page'))
+        self.assertGreater(
+            response.wsgi_request.metrics.timings['cache'], 0
+        )
+
+    def test_other_views_untouched(self):
+        with mock.patch('core.middleware.SERVER_TIMING', True):
+            response = self.get(reverse('about:author'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(response.has_header('X-DB-Queries'))
+
+    def test_disabled_by_default(self):
+        response = self.get(reverse('posts:main_page'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(response.has_header('X-DB-Queries'))
@@ -1,5 +1,12 @@
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from yatube.settings import METRICS_TOKEN
+
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,42 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html', status=403)
+
+
+def cache_stats(request):
+    """Счётчики общего кэша — только для персонала."""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    stats = getattr(caches['default'], 'stats', None)
+    if stats is None:
+        return JsonResponse(
+            {'detail': 'Кэш не ведёт статистику', 'backend': _backend()},
+            status=404,
+        )
+    return JsonResponse({'backend': _backend(), **stats()})
+
+
+def _backend():
+    backend = type(caches['default'])
+    return f'{backend.__module__}.{backend.__name__}'
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(METRICS_TOKEN) and header == f'Bearer {METRICS_TOKEN}'
+
+
+def metrics(request):
+    """Гистограммы процесса в текстовом формате Prometheus.
+
+    Доступны персоналу или сборщику с токеном ``METRICS_TOKEN``
+    в заголовке ``Authorization: Bearer``.
+    """
+    if not _metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import fulltext
 from .models import Comment, Follow, Group, Post
 
 
@@ -14,6 +15,14 @@ class PostAdmin(admin.ModelAdmin):
     # Это свойство сработает для всех колонок: где пусто — там будет эта строка
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через индекс FTS5, а не LIKE '%...%'.
+        if not search_term or not fulltext.is_supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return fulltext.matching_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description')
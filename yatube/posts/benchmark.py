@@ -0,0 +1,287 @@
+"""Нагрузочный замер всех адресов ``posts.urls`` и ``api.urls``.
+
+``seed`` заполняет базу воспроизводимым набором данных: пользователи
+и группы создаются через mixer, а посты, комментарии и подписки — пачками
+``bulk_create`` с текстами Faker, иначе миллион постов не вставить
+за разумное время. Производные данные (ленты подписок, счётчики,
+поисковый индекс) затем собираются так же, как после миграций.
+
+``measure`` прогоняет каждый адрес через тестовый клиент и записывает
+p50/p95 времени ответа, число SQL-запросов и пиковую память Python
+(tracemalloc) на запрос. ``compare`` сравнивает результат с сохранённым
+эталоном и возвращает список регрессий; адрес, которого нет в эталоне,
+тоже регрессия — новый маршрут не должен остаться незамеренным.
+"""
+import math
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from api import urls as api_urls
+
+from . import counters, fulltext, timeline
+from . import urls as posts_urls
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1M': 1_000_000,
+}
+POSTS_PER_USER = 50
+GROUPS = 20
+COMMENTS_PER_POST = 0.5
+FOLLOWS_PER_USER = 5
+BATCH_SIZE = 5000
+# Разница в пару миллисекунд у быстрых адресов — шум, а не регрессия.
+NOISE_MS = 5
+# Дополнительные GET-параметры адресов, которым без них нечего делать.
+QUERY_PARAMS = {
+    'posts:search': {'q': 'жизнь'},
+}
+# Адреса, принимающие только POST, и данные их формы.
+POST_DATA = {
+    'posts:follow_bulk': {
+        'username': ['user0', 'user1', 'user2'], 'action': 'follow',
+    },
+}
+# Подписка на самого себя ничего не пишет: эти адреса замеряются
+# от имени другого пользователя.
+FOLLOWER_ROUTES = ('posts:profile_follow', 'posts:profile_unfollow')
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(posts, seed=0):
+    """Заполняет пустую базу набором данных на ``posts`` постов."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    users_count = max(posts // POSTS_PER_USER, FOLLOWS_PER_USER + 1)
+    users = mixer.cycle(users_count).blend(
+        User,
+        username=mixer.sequence('user{0}'),
+        first_name=mixer.FAKE,
+        last_name=mixer.FAKE,
+    )
+    groups = mixer.cycle(GROUPS).blend(
+        Group,
+        slug=mixer.sequence('group-{0}'),
+        posts_count=0,
+    )
+    user_ids = [user.pk for user in users]
+    group_ids = [group.pk for group in groups] + [None]
+    for batch in _batches(
+        Post(
+            text=fake.paragraph(nb_sentences=3),
+            author_id=rng.choice(user_ids),
+            group_id=rng.choice(group_ids),
+        )
+        for _ in range(posts)
+    ):
+        Post.objects.bulk_create(batch)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    for batch in _batches(
+        Comment(
+            text=fake.sentence(),
+            post_id=rng.choice(post_ids),
+            author_id=rng.choice(user_ids),
+        )
+        for _ in range(int(posts * COMMENTS_PER_POST))
+    ):
+        Comment.objects.bulk_create(batch)
+    follows = [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(
+            [pk for pk in user_ids if pk != user_id], FOLLOWS_PER_USER
+        )
+    ]
+    Follow.objects.bulk_create(follows)
+    # bulk_create не шлёт сигналов: производные данные собираются здесь.
+    for follow in follows:
+        timeline.add_author(follow.user_id, follow.author_id)
+    counters.recount()
+    fulltext.rebuild()
+
+
+def sample_objects():
+    """Объекты, на которые указывают адреса при замере."""
+    post = Post.objects.filter(group__isnull=False).latest('pk')
+    comment = Comment.objects.filter(post=post, author=post.author).first()
+    if comment is None:
+        comment = Comment.objects.create(
+            post=post, author=post.author, text='Комментарий для замера'
+        )
+    return post, comment
+
+
+def sample_follower(author):
+    """Пользователь, который подписывается на ``author`` при замере."""
+    return User.objects.exclude(pk=author.pk).order_by('pk').first()
+
+
+URL_MODULES = (posts_urls, api_urls)
+
+
+def routes(post, comment):
+    """Адрес каждого маршрута ``URL_MODULES`` с параметрами из образцов."""
+    values = {
+        'slug': post.group.slug,
+        'username': post.author.username,
+        'post_id': post.pk,
+        'comment_id': comment.pk,
+    }
+    result = []
+    for module in URL_MODULES:
+        for pattern in module.urlpatterns:
+            kwargs = {
+                name: values[name] for name in pattern.pattern.converters
+            }
+            name = f'{module.app_name}:{pattern.name}'
+            result.append((name, reverse(name, kwargs=kwargs),
+                           QUERY_PARAMS.get(name, {}),
+                           POST_DATA.get(name)))
+    return result
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def _request(client, url, params, data=None, prepare=None):
+    """Запрос в откатываемой транзакции: ответ, время в мс и число SQL."""
+    # Адреса удаления и подписки меняют данные: каждый запрос
+    # откатывается, и все прогоны видят один и тот же набор.
+    with transaction.atomic():
+        if prepare is not None:
+            prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if data is None:
+                response = client.get(url, params)
+            else:
+                response = client.post(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        transaction.set_rollback(True)
+    return response, elapsed, len(captured)
+
+
+def _preparation(name, follower, author):
+    # Подписке нужно отсутствие подписки, отписке — сама подписка.
+    # Состояние готовится до замера и откатывается вместе с запросом.
+    if name == 'posts:profile_follow':
+        return lambda: Follow.objects.filter(
+            user=follower, author=author
+        ).delete()
+    if name == 'posts:profile_unfollow':
+        return lambda: Follow.objects.get_or_create(
+            user=follower, author=author
+        )
+    return None
+
+
+def measure(iterations=50):
+    """Замеряет все маршруты от имени автора поста-образца.
+
+    Подписку и отписку (``FOLLOWER_ROUTES``) выполняет другой
+    пользователь, иначе замер не дошёл бы до записи.
+    """
+    post, comment = sample_objects()
+    follower = sample_follower(post.author)
+    clients = {}
+    for user in (post.author, follower):
+        clients[user.pk] = Client()
+        clients[user.pk].force_login(user)
+    results = {}
+    for name, url, params, data in routes(post, comment):
+        user = follower if name in FOLLOWER_ROUTES else post.author
+        results[name] = _measure_route(
+            clients[user.pk], url, params, data, iterations,
+            _preparation(name, follower, post.author),
+        )
+    return results
+
+
+def _measure_route(client, url, params, data, iterations, prepare):
+    cache.clear()
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        response, elapsed, count = _request(
+            client, url, params, data, prepare
+        )
+        timings.append(elapsed)
+        queries = max(queries, count)
+    tracemalloc.start()
+    try:
+        _request(client, url, params, data, prepare)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance=0.5):
+    """Регрессии относительно эталона, пустой список — всё в порядке.
+
+    Число запросов сравнивается точно, время и память — с допуском
+    ``tolerance`` (и не меньше ``NOISE_MS`` для времени): замеры
+    на одной машине шумят.
+    """
+    regressions = [
+        f'{name}: нет в эталоне, обновите его (--update-baseline)'
+        for name in results if name not in baseline
+    ]
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            regressions.append(f'{name}: маршрут не замерен')
+            continue
+        if actual['status'] != expected['status']:
+            regressions.append(
+                f"{name}: статус {actual['status']}, "
+                f"в эталоне {expected['status']}"
+            )
+        if actual['queries'] > expected['queries']:
+            regressions.append(
+                f"{name}: {actual['queries']} SQL-запросов, "
+                f"в эталоне {expected['queries']}"
+            )
+        for metric, floor in (('p95_ms', NOISE_MS), ('peak_kb', 0)):
+            limit = max(
+                expected[metric] * (1 + tolerance), expected[metric] + floor
+            )
+            if actual[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {actual[metric]}, '
+                    f'в эталоне {expected[metric]}'
+                )
+    return regressions
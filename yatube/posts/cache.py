@@ -0,0 +1,120 @@
+"""Версионированный кэш фрагментов лент.
+
+У каждой ленты (главная, группа, профиль) и у сайта целиком есть счётчик
+поколения. Ключ фрагмента собирается из поколений ленты и сайта и номера
+страницы или курсора, поэтому запись в кэше живёт долго, а сигналы
+моделей просто увеличивают поколение — старые фрагменты больше
+не читаются и вытесняются по TTL.
+
+Те же поколения служат метками кэша целых страниц (``posts.page_cache``):
+представление отмечает через ``tag_page``, из каких лент собрана
+страница.
+"""
+import functools
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from yatube.settings import FEED_CACHE_TTL
+
+SITE = 'site'
+INDEX = 'index'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'profile:{author_id}'
+
+
+def post_page(post_id):
+    return f'post:{post_id}'
+
+
+def profile_stats(user_id):
+    # Счётчики подписок профиля: подписка не трогает ленту постов.
+    return f'profile-stats:{user_id}'
+
+
+def follows(user_id):
+    # Подписки пользователя: кнопки подписки на карточках его лент.
+    return f'follows:{user_id}'
+
+
+def followers(user_id):
+    return f'followers:{user_id}'
+
+
+def _version_key(feed):
+    return f'feed-version:{feed}'
+
+
+def _initial_version():
+    # Поколение, вытесненное из кэша, не должно начаться заново с единицы
+    # и совпасть со старым фрагментом, поэтому отсчёт идёт от времени.
+    return time.time_ns() // 1000
+
+
+def get_versions(*feeds):
+    keys = [_version_key(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    missing = {
+        key: _initial_version() for key in keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*feeds):
+    """Делает устаревшими все закэшированные фрагменты лент.
+
+    Внутри транзакции поколения увеличиваются ещё раз после фиксации:
+    параллельный запрос мог успеть прочитать новое поколение вместе
+    со старыми данными и закэшировать их.
+    """
+    _bump(feeds)
+    if connection.in_atomic_block:
+        transaction.on_commit(functools.partial(_bump, feeds))
+
+
+def _bump(feeds):
+    for feed in set(feeds):
+        key = _version_key(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+
+def tag_page(request, *feeds):
+    """Отмечает страницу запроса лентами и возвращает их поколения."""
+    versions = get_versions(*feeds)
+    tags = getattr(request, 'page_cache_tags', {})
+    tags.update(zip(feeds, versions))
+    request.page_cache_tags = tags
+    return versions
+
+
+def fragment_context(request, *feeds):
+    """Контекст для ``{% cache feed_cache_ttl ... feed_cache_key %}``.
+
+    На карточках вошедшего пользователя есть кнопки подписки, поэтому
+    его фрагменты свои и зависят от поколения его подписок.
+    """
+    feeds = (SITE,) + feeds
+    if request.user.is_authenticated:
+        feeds += (follows(request.user.pk),)
+    versions = tag_page(request, *feeds)
+    key = ':'.join(
+        [f'{feed}={version}' for feed, version in zip(feeds, versions)]
+        + [request.GET.get('cursor', ''), request.GET.get('page', '')]
+    )
+    return {
+        'feed_cache_key': key,
+        'feed_cache_ttl': FEED_CACHE_TTL,
+    }
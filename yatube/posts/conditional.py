@@ -0,0 +1,128 @@
+"""Условные GET-запросы к страницам лент для анонимных посетителей.
+
+Для анонима страница ленты зависит только от данных, поэтому валидаторы
+строятся без рендера: поколения кэша лент (``posts.cache``, меняются
+при правке и удалении постов, групп и имён авторов) плюс одна
+агрегатная выборка — самый новый ``pub_date`` и счётчики. На совпавший
+``If-None-Match`` уходит 304 без выборки страницы и рендера.
+``Last-Modified`` не ставится: правка и удаление поста не меняют
+``pub_date``, и клиент с одним ``If-Modified-Since`` получал бы
+устаревший 304.
+
+Ответы анонимам помечаются ``Cache-Control: public`` с ``max-age``
+из ``ANONYMOUS_CACHE_MAX_AGE``, а вошедшим — ``private``; ``Vary: Cookie``
+стоит у всех, чтобы обратный прокси не отдал анонимную копию
+вошедшему пользователю.
+"""
+import functools
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+
+from yatube.settings import ANONYMOUS_CACHE_MAX_AGE
+
+from . import cache as feed_cache
+from .models import Group, Post
+
+User = get_user_model()
+
+# Меняется вместе с разметкой страниц, чтобы старые ETag не совпали.
+PAGE_VERSION = 3
+STATS_FIELDS = (
+    'stats__posts_count',
+    'stats__comments_count',
+    'stats__followers_count',
+    'stats__following_count',
+)
+
+
+def _etag(request, parts):
+    payload = repr((PAGE_VERSION, request.get_full_path(), parts))
+    return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+
+def index_state(request):
+    newest = Post.objects.aggregate(newest=Max('pub_date'))['newest']
+    versions = feed_cache.get_versions(feed_cache.SITE, feed_cache.INDEX)
+    return versions, newest
+
+
+def group_state(request, slug):
+    row = Group.objects.filter(slug=slug).values(
+        'pk', 'posts_count'
+    ).annotate(newest=Max('posts__pub_date')).first()
+    if row is None:
+        return None
+    versions = feed_cache.get_versions(
+        feed_cache.SITE, feed_cache.group_feed(row['pk'])
+    )
+    return versions, row
+
+
+def profile_state(request, username):
+    row = User.objects.filter(username=username).values(
+        'pk', *STATS_FIELDS
+    ).annotate(newest=Max('posts__pub_date')).first()
+    if row is None:
+        return None
+    versions = feed_cache.get_versions(
+        feed_cache.SITE, feed_cache.profile_feed(row['pk'])
+    )
+    return versions, row
+
+
+def post_state(request, post_id):
+    if not str(post_id).isdigit():
+        return None
+    row = Post.objects.filter(pk=post_id).values(
+        'pub_date', 'author_id', 'author__stats__posts_count'
+    ).annotate(newest=Max('comments__pub_date')).first()
+    if row is None:
+        return None
+    # Правка поста меняет поколение ленты профиля его автора, а новый
+    # или удалённый комментарий — поколение страницы поста. Комментарии
+    # не пересчитываются: на популярном посте их тысячи.
+    versions = feed_cache.get_versions(
+        feed_cache.SITE,
+        feed_cache.profile_feed(row['author_id']),
+        feed_cache.post_page(post_id),
+    )
+    return versions, row
+
+
+def anonymous_conditional(state):
+    """Отвечает анонимам 304 по валидаторам из ``state``.
+
+    ``state(request, *args, **kwargs)`` возвращает части ETag или None,
+    если объекта нет, — тогда ответ (обычно 404) строит само
+    представление.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            parts = None
+            if (request.method in ('GET', 'HEAD')
+                    and not request.user.is_authenticated):
+                parts = state(request, *args, **kwargs)
+            if parts is None:
+                response = view(request, *args, **kwargs)
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+            etag = _etag(request, parts)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                patch_cache_control(
+                    response, public=True, max_age=ANONYMOUS_CACHE_MAX_AGE
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
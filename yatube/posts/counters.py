@@ -0,0 +1,74 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным ``UPDATE ... SET n = n + 1`` в сигналах
+моделей, поэтому страницы читают готовые числа вместо COUNT(*).
+Расхождения, если они всё же возникнут, исправляет команда ``recount``.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        # Счётчик не уходит в минус, даже если успел разойтись с данными.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    stats = UserStats.objects.filter(pk=user_id)
+    if not _change(stats, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        _change(stats, field, delta)
+
+
+def change_users_counter(user_ids, field, delta):
+    """``change_user_counter`` для многих пользователей одним UPDATE."""
+    user_ids = list(user_ids)
+    stats = UserStats.objects.filter(pk__in=user_ids)
+    if _change(stats, field, delta) < len(user_ids) and delta > 0:
+        # Строк счётчиков ещё нет — они создаются по одной.
+        existing = set(stats.values_list('pk', flat=True))
+        for user_id in user_ids:
+            if user_id not in existing:
+                change_user_counter(user_id, field, delta)
+
+
+def change_group_counter(group_id, delta):
+    _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def user_stats(user):
+    """Счётчики пользователя; строка создаётся, если её ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats.objects.get_or_create(user=user)[0]
+
+
+def _count_of(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики по фактическим данным."""
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id)
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=_count_of(Post, 'author'),
+        comments_count=_count_of(Comment, 'author'),
+        followers_count=_count_of(Follow, 'author'),
+        following_count=_count_of(Follow, 'user'),
+    )
+    Group.objects.update(posts_count=_count_of(Post, 'group'))
@@ -0,0 +1,182 @@
+"""Подписка и отписка одним запросом, в том числе на многих авторов сразу.
+
+Подписка — ``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING``:
+имена авторов превращаются в id в той же инструкции, существующие
+подписки пропускаются, а в ответ приходят id только новых строк.
+Отписка — ``DELETE ... RETURNING``. Ни ``get_or_create``, ни ``exists()``
+перед записью, поэтому и гонки двух одновременных нажатий нет.
+
+Сырой SQL не вызывает сигналы ``Follow``, поэтому лента подписок,
+счётчики и поколения кэша обновляются здесь явно — теми же
+``followed``/``unfollowed``, что вызывают и сигналы. Старые посты новых
+авторов попадают в ленту фоновой задачей ``timeline.backfill_authors``,
+а при отписке убираются сразу, чтобы лента не показывала чужих авторов.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache as feed_cache
+from . import counters, timeline
+from .models import Follow, UserStats
+
+User = get_user_model()
+
+# RETURNING в SQLite появился в 3.35.
+SQLITE_RETURNING_VERSION = (3, 35, 0)
+
+
+def is_supported(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= SQLITE_RETURNING_VERSION
+    return vendor == 'postgresql'
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return quote(Follow._meta.db_table), quote(User._meta.db_table)
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _insert(user_id, usernames):
+    follow, user = _tables()
+    if not is_supported():
+        authors = set(User.objects.filter(
+            username__in=usernames
+        ).exclude(pk=user_id).values_list('pk', flat=True))
+        authors -= set(Follow.objects.filter(
+            user_id=user_id, author_id__in=authors
+        ).values_list('author_id', flat=True))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=pk) for pk in authors],
+            ignore_conflicts=True,
+        )
+        return sorted(authors)
+    sql = (
+        f'INSERT INTO {follow} (user_id, author_id, pub_date) '
+        f'SELECT %s, id, %s FROM {user} '
+        f'WHERE username IN ({_placeholders(usernames)}) AND id <> %s '
+        f'ON CONFLICT (user_id, author_id) DO NOTHING '
+        f'RETURNING author_id'
+    )
+    pub_date = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, pub_date, *usernames, user_id])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _delete(user_id, usernames):
+    follow, user = _tables()
+    if not is_supported():
+        follows = Follow.objects.filter(
+            user_id=user_id, author__username__in=usernames
+        )
+        authors = list(follows.values_list('author_id', flat=True))
+        Follow.objects.filter(
+            user_id=user_id, author_id__in=authors
+        ).delete()
+        return authors
+    sql = (
+        f'DELETE FROM {follow} WHERE user_id = %s AND author_id IN ('
+        f'SELECT id FROM {user} '
+        f'WHERE username IN ({_placeholders(usernames)})) '
+        f'RETURNING author_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *usernames])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _invalidate(user_id, author_ids):
+    feed_cache.bump(
+        feed_cache.profile_stats(user_id),
+        feed_cache.follows(user_id),
+        *(feed_cache.profile_stats(author_id) for author_id in author_ids),
+        *(feed_cache.followers(author_id) for author_id in author_ids),
+    )
+
+
+def _add(user_id, author_ids):
+    timeline.backfill_authors.delay(user_id, list(author_ids))
+    counters.change_user_counter(
+        user_id, 'following_count', len(author_ids)
+    )
+    counters.change_users_counter(author_ids, 'followers_count', 1)
+
+
+def _remove(user_id, author_ids):
+    timeline.remove_authors(user_id, author_ids)
+    counters.change_user_counter(
+        user_id, 'following_count', -len(author_ids)
+    )
+    counters.change_users_counter(author_ids, 'followers_count', -1)
+
+
+def followed(user_id, author_ids):
+    """Лента, счётчики и кэш после новых подписок ``user_id``."""
+    _add(user_id, author_ids)
+    _invalidate(user_id, author_ids)
+
+
+def unfollowed(user_id, author_ids):
+    """Лента, счётчики и кэш после отписки ``user_id`` от авторов."""
+    _remove(user_id, author_ids)
+    _invalidate(user_id, author_ids)
+
+
+def follow(user_id, usernames):
+    """Подписывает на авторов ``usernames``; id новых подписок.
+
+    Несуществующие имена, уже оформленные подписки и сам пользователь
+    пропускаются без ошибки.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return []
+    with transaction.atomic():
+        author_ids = _insert(user_id, usernames)
+        if author_ids:
+            _add(user_id, author_ids)
+    # Поколения кэша — после фиксации, иначе параллельный запрос успеет
+    # закэшировать старые данные под новым поколением.
+    if author_ids:
+        _invalidate(user_id, author_ids)
+    return author_ids
+
+
+def unfollow(user_id, usernames):
+    """Отписывает от авторов ``usernames``; id снятых подписок."""
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return []
+    with transaction.atomic():
+        author_ids = _delete(user_id, usernames)
+        if author_ids:
+            _remove(user_id, author_ids)
+    if author_ids:
+        _invalidate(user_id, author_ids)
+    return author_ids
+
+
+def counts(user_id, author_ids):
+    """Счётчики подписок пользователя и подписчиков авторов одним запросом.
+
+    ``{'following_count': n, 'followers': {username: n}}``.
+    """
+    rows = UserStats.objects.filter(
+        user_id__in=[user_id, *author_ids]
+    ).values_list(
+        'user_id', 'user__username', 'following_count', 'followers_count'
+    )
+    result = {'following_count': 0, 'followers': {}}
+    for pk, username, following_count, followers_count in rows:
+        if pk == user_id:
+            result['following_count'] = following_count
+        if pk in author_ids:
+            result['followers'][username] = followers_count
+    return result
@@ -0,0 +1,36 @@
+"""Подписки зрителя для кнопок «Подписаться» на карточках и в профиле.
+
+Список подписок берётся из графа подписок (``posts.graph``) — из кэша,
+а после подписки или отписки одним запросом. Проверка подписки
+на странице — поиск в множестве, сколько бы авторов ни было в ленте.
+"""
+from django.utils.functional import cached_property
+
+from . import graph
+
+
+class FollowState:
+    """``author_id in state`` — подписан ли зритель на автора.
+
+    Подписки загружаются при первой проверке, анониму — пустое множество.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def author_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return graph.following(self.user.pk)
+
+    def __contains__(self, author_id):
+        return author_id in self.author_ids
+
+
+def for_request(request):
+    """Одно ``FollowState`` на запрос."""
+    state = getattr(request, '_follow_state', None)
+    if state is None:
+        state = request._follow_state = FollowState(request.user)
+    return state
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -8,6 +10,23 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отброшенные ImageUploadHandler ещё во время загрузки.
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            uploads.check_image_header(image)
+            image = uploads.normalize_image(image)
+        return image
+
+    def clean(self):
+        for field, message in self.upload_errors.items():
+            self.add_error(field, message)
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
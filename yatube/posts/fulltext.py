@@ -0,0 +1,288 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс — виртуальная таблица SQLite FTS5 ``posts_search`` с колонками
+``text`` и ``post_id``. Пост хранится под rowid ``2 * id``, комментарий —
+под ``2 * id + 1``, поэтому строку индекса можно заменить или удалить
+по первичному ключу без поиска. Индекс обновляют сигналы моделей
+(новый и изменённый текст — фоновыми задачами ``reindex_post``
+и ``reindex_comment``), а команда ``rebuild_search_index`` собирает
+его заново.
+
+Результаты — посты, отсортированные по лучшему bm25 среди текста поста
+и его комментариев, со сниппетом из лучшего совпадения.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core import jobs
+
+from .models import Comment, Post
+from .paginators import KeysetPaginator
+
+TABLE = 'posts_search'
+TOKENIZER = 'unicode61 remove_diacritics 2'
+MAX_TERMS = 10
+SNIPPET_TOKENS = 16
+# Сколько совпадений в среднем читается на один пост страницы.
+HITS_PER_POST = 3
+# Управляющие символы не встречаются в тексте и переживают escape().
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+def is_supported(vendor=None):
+    return (vendor or connection.vendor) == 'sqlite'
+
+
+def _post_rowid(post_id):
+    return 2 * post_id
+
+
+def _comment_rowid(comment_id):
+    return 2 * comment_id + 1
+
+
+def _replace(rowid, text, post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, post_id) VALUES (%s, %s, %s)',
+            [rowid, text, post_id],
+        )
+
+
+def _delete(rowid):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+
+
+def index_post(post):
+    _replace(_post_rowid(post.pk), post.text, post.pk)
+
+
+def index_comment(comment):
+    _replace(_comment_rowid(comment.pk), comment.text, comment.post_id)
+
+
+@jobs.task
+def reindex_post(post_id):
+    """Задача: индексирует текущий текст поста, если он ещё есть."""
+    post = Post.objects.filter(pk=post_id).only('text').first()
+    if post is not None:
+        index_post(post)
+
+
+@jobs.task
+def reindex_comment(comment_id):
+    """Задача: индексирует текущий текст комментария, если он ещё есть."""
+    comment = Comment.objects.filter(pk=comment_id).only(
+        'text', 'post_id'
+    ).first()
+    if comment is not None:
+        index_comment(comment)
+
+
+def remove_post(post_id):
+    # Комментарии удаляются каскадом и убираются своими сигналами.
+    _delete(_post_rowid(post_id))
+
+
+def remove_comment(comment_id):
+    _delete(_comment_rowid(comment_id))
+
+
+def rebuild(batch_size=2000):
+    """Собирает индекс заново. Возвращает число проиндексированных строк."""
+    if not is_supported():
+        return 0
+    sources = (
+        (Post, 'pk', _post_rowid),
+        (Comment, 'post_id', _comment_rowid),
+    )
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for model, post_field, rowid in sources:
+            rows = model.objects.order_by().values_list(
+                'pk', 'text', post_field
+            ).iterator(chunk_size=batch_size)
+            batch = []
+            for pk, text, post_id in rows:
+                batch.append((rowid(pk), text, post_id))
+                if len(batch) == batch_size:
+                    total += _insert_many(cursor, batch)
+                    batch = []
+            total += _insert_many(cursor, batch)
+        # Сливает сегменты индекса после массовой вставки.
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _insert_many(cursor, batch):
+    if batch:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text, post_id) VALUES (%s, %s, %s)',
+            batch,
+        )
+    return len(batch)
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова, по префиксу.
+
+    Берутся только слова, поэтому кавычки и операторы FTS5 из запроса
+    не попадают в MATCH и не ломают его.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_posts(queryset, query):
+    """Посты, в тексте которых есть все слова запроса, — для админки."""
+    match = match_expression(query)
+    if not match or not is_supported():
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT post_id FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND (rowid & 1) = 0',
+        [match],
+    ))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class SearchPaginator(KeysetPaginator):
+    """Курсорная пагинация результатов поиска по ключу (ранг, id поста).
+
+    bm25 в FTS5 отрицательный: чем меньше, тем выше совпадение, поэтому
+    обе части ключа сортируются по возрастанию.
+    """
+    default_ordering = ('search_rank', 'pk')
+
+    def __init__(self, query, per_page):
+        self.match = match_expression(query)
+        self.ordering = self.default_ordering
+        super(KeysetPaginator, self).__init__([], per_page)
+
+    def _fetch(self, values, backwards, limit):
+        if not self.match or not is_supported():
+            return []
+        hits = self._best_hits(values, backwards, limit)
+        snippets = self._snippets([hit for _, _, hit in hits])
+        posts = Post.objects.for_feed().in_bulk([hit[1] for hit in hits])
+        rows = []
+        for score, post_id, hit in hits:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_rank = score
+            post.search_snippet = highlight(snippets.get(hit, ''))
+            post.search_in_comment = bool(hit & 1)
+            rows.append(post)
+        return rows
+
+    def _best_hits(self, values, backwards, limit):
+        """Лучшие совпадения постов страницы: (ранг, id поста, rowid).
+
+        Совпадения читаются порциями от курсора в порядке ключа, поэтому
+        страница не ранжирует и не группирует всю выдачу. Ключ поста —
+        его лучшее совпадение среди всех, а не только прочитанных, он
+        досчитывается отдельным запросом. Пост с ключом до курсора уже
+        был на прошлых страницах и пропускается. Чтение останавливается,
+        когда ключи ``limit`` постов не могут быть вытеснены непрочитанными
+        совпадениями.
+        """
+        cursor_key = tuple(values) if values is not None else None
+        keys = {}
+        offset = 0
+        size = limit * HITS_PER_POST
+        while True:
+            chunk = self._hits(cursor_key, backwards, size, offset)
+            offset += len(chunk)
+            fresh = {post_id for _, post_id, _ in chunk} - keys.keys()
+            keys.update(self._post_keys(fresh))
+            found = [
+                key for key in keys.values()
+                if cursor_key is None
+                or (key[:2] < cursor_key if backwards
+                    else key[:2] > cursor_key)
+            ]
+            if len(chunk) < size:
+                break
+            edge = chunk[-1][:2]
+            found = [
+                key for key in found
+                if (key[:2] >= edge if backwards else key[:2] <= edge)
+            ]
+            if len(found) >= limit:
+                break
+        return sorted(found, reverse=backwards)[:limit]
+
+    def _hits(self, cursor_key, backwards, size, offset):
+        where = ''
+        params = [self.match]
+        if cursor_key is not None:
+            where = 'AND (rank, post_id) {} (%s, %s)'.format(
+                '<' if backwards else '>'
+            )
+            params.extend(cursor_key)
+        direction = 'DESC' if backwards else 'ASC'
+        params.extend([size, offset])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rank, post_id, rowid FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s {where} '
+                f'ORDER BY rank {direction}, post_id {direction} '
+                f'LIMIT %s OFFSET %s',
+                params,
+            )
+            return cursor.fetchall()
+
+    def _post_keys(self, post_ids):
+        """Лучшее совпадение каждого поста: голая колонка rowid при MIN()
+        берётся SQLite из строки с минимальным рангом."""
+        if not post_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT MIN(rank), post_id, rowid FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s AND post_id IN ({placeholders}) '
+                f'GROUP BY post_id',
+                [self.match, *post_ids],
+            )
+            return {row[1]: row for row in cursor.fetchall()}
+
+    def _snippets(self, rowids):
+        """Сниппеты только для строк страницы, а не для всех совпадений."""
+        if not rowids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(rowids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({TABLE}, 0, %s, %s, '…', %s) "
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'AND rowid IN ({placeholders})',
+                [HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, self.match,
+                 *rowids],
+            )
+            return dict(cursor.fetchall())
+
+    def _to_python(self, name, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(value)
+        return value
@@ -0,0 +1,135 @@
+"""Граф подписок: на кого подписан пользователь и кто подписан на него.
+
+Для каждого пользователя в кэше лежат два списка id — подписки
+(``FOLLOWING``) и подписчики (``FOLLOWERS``) — от новых к старым,
+упакованные в ``array``: восемь байт на id вместо объекта int
+и ячейки множества. Списки живут под поколениями ``posts.cache.follows``
+и ``posts.cache.followers``, которые увеличивают сигналы ``Follow``,
+и читаются заново одним запросом по индексу ``follow_user_recent_idx``
+(user, -id) или ``follow_author_recent_idx`` (author, -id) из миграции
+0019 — он отдаёт строки уже в порядке от новых к старым. Запросы страниц
+сами таблицу ``Follow`` не читают.
+
+Списки многих пользователей (подписки друзей для рекомендаций)
+читаются одним ``get_many`` и одним запросом на все промахи.
+"""
+import array
+from collections import Counter
+
+from django.core.cache import cache
+
+from yatube.settings import FEED_CACHE_TTL
+
+from . import cache as feed_cache
+from .models import Follow
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+TYPECODE = 'q'
+# Рекомендации считаются по подпискам самых новых SUGGESTION_SAMPLE
+# подписок пользователя.
+SUGGESTIONS = 10
+SUGGESTION_SAMPLE = 200
+
+
+class IdSet:
+    """Список id от новых к старым: срезы для страниц и ``in``."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self._members = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, index):
+        return self.ids[index]
+
+    def __contains__(self, user_id):
+        # Множество строится только при первой проверке.
+        if self._members is None:
+            self._members = frozenset(self.ids)
+        return user_id in self._members
+
+
+def _generation(kind, user_id):
+    if kind == FOLLOWING:
+        return feed_cache.follows(user_id)
+    return feed_cache.followers(user_id)
+
+
+def _fetch(kind, user_ids):
+    own, other = 'user_id', 'author_id'
+    if kind == FOLLOWERS:
+        own, other = other, own
+    lists = {user_id: array.array(TYPECODE) for user_id in user_ids}
+    rows = Follow.objects.filter(
+        **{f'{own}__in': user_ids}
+    ).order_by('-pk').values_list(own, other)
+    for user_id, other_id in rows.iterator():
+        lists[user_id].append(other_id)
+    return lists
+
+
+def load(kind, user_ids):
+    """{user_id: IdSet} со списками ``kind`` пользователей ``user_ids``."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    versions = feed_cache.get_versions(
+        *(_generation(kind, user_id) for user_id in user_ids)
+    )
+    keys = {
+        user_id: f'graph:{kind}:{user_id}:{version}'
+        for user_id, version in zip(user_ids, versions)
+    }
+    found = cache.get_many(list(keys.values()))
+    lists = {
+        user_id: found[key] for user_id, key in keys.items() if key in found
+    }
+    missing = [user_id for user_id in user_ids if user_id not in lists]
+    if missing:
+        fetched = _fetch(kind, missing)
+        cache.set_many(
+            {keys[user_id]: ids for user_id, ids in fetched.items()},
+            FEED_CACHE_TTL,
+        )
+        lists.update(fetched)
+    return {user_id: IdSet(lists[user_id]) for user_id in user_ids}
+
+
+def following(user_id):
+    return load(FOLLOWING, [user_id])[user_id]
+
+
+def followers(user_id):
+    return load(FOLLOWERS, [user_id])[user_id]
+
+
+def is_mutual(user_id, other_id):
+    """Подписаны ли пользователи друг на друга."""
+    return (other_id in following(user_id)
+            and user_id in following(other_id))
+
+
+def suggestions(user_id, limit=SUGGESTIONS, sample=SUGGESTION_SAMPLE):
+    """Кого почитать: [(id, число общих подписок)], сначала популярные.
+
+    Кандидаты — подписки подписок пользователя, на которых он сам
+    ещё не подписан.
+    """
+    own = following(user_id)
+    counts = Counter()
+    for ids in load(FOLLOWING, own[:sample]).values():
+        counts.update(ids)
+    result = []
+    for candidate, count in counts.most_common():
+        if candidate == user_id or candidate in own:
+            continue
+        result.append((candidate, count))
+        if len(result) == limit:
+            break
+    return result
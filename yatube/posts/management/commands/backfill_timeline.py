@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок по существующим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Предварительно удалить все записи лент.',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            TimelineEntry.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        total = 0
+        for user_id, author_id in follows.iterator():
+            timeline.add_author(user_id, author_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {total}, '
+            f'записей в лентах: {TimelineEntry.objects.count()}'
+        ))
@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+
+from posts import benchmark
+from posts.models import Post
+from yatube.settings import BASE_DIR
+
+BENCHMARK_DIR = os.path.join(BASE_DIR, 'benchmarks')
+BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число SQL-запросов и память всех адресов '
+        'posts.urls и api.urls на сгенерированном наборе данных и сравнивает '
+        'с эталоном. Данные и кэш — отдельные, во временных файлах: '
+        'рабочие база и кэш не затрагиваются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            choices=benchmark.SIZES,
+            default='10k',
+            help='Размер набора данных в постах.',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Сколько раз запрашивать каждый адрес.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help='Допустимый рост p95 и памяти относительно эталона.',
+        )
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Записать результат как новый эталон.',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Сохранить базу с набором данных для следующих запусков.',
+        )
+
+    def handle(self, *args, **options):
+        # Замер очищает кэш и увеличивает поколения лент, а откат
+        # транзакций кэш не возвращает, поэтому кэш — свой, временный.
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                override_settings(CACHES=self.throwaway_caches(cache_dir)):
+            self.run_benchmark(options)
+
+    def throwaway_caches(self, directory):
+        return {
+            alias: {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(directory, f'{alias}.sqlite3'),
+                'OPTIONS': config.get('OPTIONS', {}),
+            }
+            for alias, config in settings.CACHES.items()
+        }
+
+    def run_benchmark(self, options):
+        size = options['size']
+        # Замер идёт в отдельной базе benchmarks/<size>.sqlite3,
+        # рабочая база не затрагивается.
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            BENCHMARK_DIR, f'{size}.sqlite3'
+        )
+        setup_test_environment(debug=False)
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb']
+        )
+        try:
+            if Post.objects.count() != benchmark.SIZES[size]:
+                self.stdout.write(f'Генерация набора данных {size}...')
+                call_command('flush', interactive=False, verbosity=0)
+                with transaction.atomic():
+                    benchmark.seed(benchmark.SIZES[size])
+            results = benchmark.measure(options['iterations'])
+        finally:
+            teardown_databases(
+                old_config, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        self.report(results)
+        self.check_baseline(size, results, options)
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'маршрут':<28}{'код':>5}{'p50, мс':>10}{'p95, мс':>10}"
+            f"{'SQL':>6}{'память, КБ':>12}"
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<28}{row['status']:>5}{row['p50_ms']:>10}"
+                f"{row['p95_ms']:>10}{row['queries']:>6}{row['peak_kb']:>12}"
+            )
+
+    def check_baseline(self, size, results, options):
+        path = options['baseline']
+        baselines = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                baselines = json.load(file)
+        if options['update_baseline']:
+            baselines[size] = results
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(baselines, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                file.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Эталон {size} обновлён'))
+            return
+        if size not in baselines:
+            raise CommandError(
+                f'Нет эталона для {size}: запустите с --update-baseline'
+            )
+        regressions = benchmark.compare(
+            results, baselines[size], options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно эталона:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
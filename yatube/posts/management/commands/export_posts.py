@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON вместе с картинками постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для выгрузки.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        total = transfer.export(
+            options['directory'], chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Выгружено записей: {total}'))
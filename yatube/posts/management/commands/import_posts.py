@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts. Уже загруженные объекты '
+        'пропускаются, поэтому прерванный импорт можно повторить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с выгрузкой.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько объектов вставлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Не пересобирать ленты, счётчики и поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(
+            options['directory'], batch_size=options['batch_size']
+        )
+        created = importer.run()
+        if not options['skip_rebuild']:
+            transfer.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено: ' + ', '.join(
+                f'{kind} — {count}' for kind, count in created.items()
+            )
+        ))
+        if importer.orphaned:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено комментариев без поста или автора: '
+                f'{importer.orphaned}'
+            ))
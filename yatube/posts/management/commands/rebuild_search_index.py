@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает полнотекстовый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Сколько строк вставлять в индекс за раз.',
+        )
+
+    def handle(self, *args, **options):
+        if not fulltext.is_supported():
+            self.stderr.write('Поиск поддерживается только на SQLite')
+            return
+        with transaction.atomic():
+            total = fulltext.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано записей: {total}'
+        ))
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Схема индекса на момент миграции; posts.fulltext может её поменять
+# только новой миграцией.
+TABLE = 'posts_search'
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+        f"text, post_id UNINDEXED, tokenize='{TOKENIZER}')"
+    )
+    # Пост — под rowid 2 * id, комментарий — под 2 * id + 1.
+    schema_editor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, post_id) '
+        f'SELECT 2 * id, text, id FROM {Post._meta.db_table}'
+    )
+    schema_editor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, post_id) '
+        f'SELECT 2 * id + 1, text, post_id FROM {Comment._meta.db_table}'
+    )
+    schema_editor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -11,11 +11,51 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
 
 
+TIMELINE_ORDERING = ('-timeline_date', '-timeline_post')
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: ровно те поля, что выводит карточка поста.
+
+        Автор и группа подтягиваются одним JOIN, поэтому страница ленты
+        не делает по запросу на каждую карточку.
+        """
+        return self.select_related('author', 'group').only(
+            'pub_date',
+            'text',
+            'image',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        )
+
+    def for_timeline(self, user):
+        """Лента подписок пользователя в порядке ``TIMELINE_ORDERING``.
+
+        Лента материализована в TimelineEntry: индекс (user, pub_date)
+        отдаёт страницу без JOIN через Follow и без сортировки.
+        """
+        return self.for_feed().filter(
+            timeline_entries__user=user
+        ).annotate(
+            timeline_date=models.F('timeline_entries__pub_date'),
+            timeline_post=models.F('timeline_entries__post'),
+        ).order_by(*TIMELINE_ORDERING)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         'Текст поста',
@@ -25,7 +65,9 @@ class Post(CreatedModel):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        # индекс покрыт составным (author, pub_date, id)
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -34,7 +76,8 @@ class Post(CreatedModel):
         null=True,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False,
     )
     image = models.ImageField(
         'Картинка',
@@ -42,6 +85,23 @@ class Post(CreatedModel):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta(CreatedModel.Meta):
+        # Ленты сортируются по (pub_date, id): главная целиком,
+        # группа и профиль — внутри своего автора или группы.
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_feed_idx'),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_feed_idx'),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_feed_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -55,6 +115,7 @@ class Comment(CreatedModel):
         verbose_name='Пост',
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         to=User,
@@ -67,17 +128,27 @@ class Comment(CreatedModel):
         help_text='Введите комменатрий'
     )
 
+    class Meta(CreatedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_feed_idx'),
+        ]
+
 
 class Follow(CreatedModel):
+    # Индексы по user и author покрыты составными ниже.
     user = models.ForeignKey(
         to=User,
         related_name='follower',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         to=User,
         related_name='following',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     class Meta:
@@ -86,3 +157,69 @@ class Follow(CreatedModel):
                 fields=['user', 'author'],
                 name='user_and_author_uniq_together'),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'),
+            # Списки графа подписок (posts/graph.py), от новых к старым.
+            models.Index(
+                fields=['user', '-id'],
+                name='follow_user_recent_idx'),
+            models.Index(
+                fields=['author', '-id'],
+                name='follow_author_recent_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост автора, разложенный в ленту подписчика при публикации."""
+    user = models.ForeignKey(
+        to=User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        to=Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+    )
+    # Копии полей поста: лента читается по индексу без JOIN и сортировки.
+    author = models.ForeignKey(
+        to=User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_and_post_uniq_together'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи, а не COUNT(*)."""
+    user = models.OneToOneField(
+        to=User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
@@ -0,0 +1,25 @@
+"""Почтовые уведомления подписчикам о новых постах.
+
+Уведомление — строка дайджеста ``core.mail``: сколько бы постов
+ни опубликовали авторы за ``MAIL_DIGEST_INTERVAL``, подписчик получит
+одно письмо.
+"""
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+
+from yatube.settings import SITE_URL
+
+from core import mail
+
+User = get_user_model()
+
+
+def notify_followers(post):
+    """Добавляет пост в дайджесты подписчиков автора с адресом почты."""
+    text = render_to_string(
+        'posts/email/new_post.txt', {'post': post, 'site_url': SITE_URL}
+    ).strip()
+    emails = User.objects.filter(
+        follower__author_id=post.author_id
+    ).exclude(email='').values_list('email', flat=True)
+    mail.queue_digest((email, text) for email in emails.iterator())
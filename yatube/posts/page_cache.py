@@ -0,0 +1,87 @@
+"""Кэш целых страниц лент для анонимных посетителей.
+
+Ответ анониму сохраняется целиком под ключом из адреса запроса вместе
+со снимком поколений лент, из которых собрана страница
+(``posts.cache.tag_page``). При чтении поколения сверяются со снимком
+одним ``get_many``: новый пост сбрасывает главную, профиль автора
+и ленту его группы, комментарий — только страницу своего поста,
+и ничего больше. Попадание обходится без представления, ORM
+и шаблонов; на совпавший ``If-None-Match`` из кэша уходит 304.
+
+Не кэшируются ответы вошедшим пользователям, ответы с cookie
+или флеш-сообщениями и страницы с заглушкой ещё не нарезанной
+миниатюры.
+"""
+import functools
+import hashlib
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.utils.cache import get_conditional_response
+
+from yatube.settings import PAGE_CACHE_TTL, THUMBNAIL_PLACEHOLDER
+
+from . import cache as feed_cache
+
+
+def _key(request):
+    url = request.build_absolute_uri()
+    return 'page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def _cacheable_response(request, response):
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and getattr(request, 'page_cache_tags', None)
+        and static(THUMBNAIL_PLACEHOLDER).encode() not in response.content
+    )
+
+
+def _is_fresh(entry):
+    feeds = list(entry['tags'])
+    current = feed_cache.get_versions(*feeds)
+    return current == [entry['tags'][feed] for feed in feeds]
+
+
+def _cached_response(request, entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers']:
+        response[header] = value
+    not_modified = get_conditional_response(
+        request, etag=response.get('ETag'), response=response
+    )
+    return not_modified or response
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу представления для анонимных посетителей."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry):
+            return _cached_response(request, entry)
+        response = view(request, *args, **kwargs)
+        if _cacheable_response(request, response):
+            cache.set(key, {
+                'tags': request.page_cache_tags,
+                'content': response.content,
+                'headers': list(response.items()),
+            }, PAGE_CACHE_TTL)
+        return response
+    return wrapper
@@ -0,0 +1,263 @@
+import base64
+import binascii
+import copy
+import json
+import operator
+from functools import reduce
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from yatube.settings import FEED_CACHE_TTL, PAGINATOR_ESTIMATE_THRESHOLD
+
+from . import cache as feed_cache
+
+ELLIPSIS = '…'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPaginator(Paginator):
+    """Пагинация по ключу сортировки вместо OFFSET.
+
+    Каждая страница выбирается одним запросом
+    ``WHERE (pub_date, id) < (...) ORDER BY pub_date DESC, id DESC LIMIT n``,
+    поэтому время выборки не зависит от глубины страницы, а COUNT(*)
+    не выполняется вовсе. Курсор — непрозрачная строка с ключом крайней
+    записи страницы и направлением перехода.
+
+    Страницы — обычные ``Page``: номер у них условный (1 — первая страница
+    ленты, 2 — любая следующая), а курсоры соседей лежат в атрибутах
+    ``next_cursor`` и ``previous_cursor``.
+    """
+    is_keyset = True
+    default_ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, ordering=None):
+        ordering = ordering or self.default_ordering
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+
+    def get_page(self, cursor=None):
+        """Как ``Paginator.get_page``: на битый курсор — первая страница."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def page(self, cursor=None):
+        backwards, values = False, None
+        if cursor:
+            backwards, values = self._decode(cursor)
+        # Лишняя запись показывает, есть ли что-то за пределами страницы.
+        rows = self._fetch(values, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._encode(rows[-1], backwards=False)
+        if rows and has_previous:
+            previous_cursor = self._encode(rows[0], backwards=True)
+        return self._make_page(rows, next_cursor, previous_cursor)
+
+    def _fetch(self, values, backwards, limit):
+        """Записи строго после ключа ``values`` в порядке страницы."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[:limit])
+
+    def _make_page(self, rows, next_cursor, previous_cursor):
+        number = 2 if previous_cursor else 1
+        # Каждой странице — свой пагинатор: num_pages описывает только её
+        # окрестность, всего страниц курсорная пагинация не знает.
+        paginator = copy.copy(self)
+        paginator.num_pages = number + int(next_cursor is not None)
+        page = Page(rows, number, paginator)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _to_python(self, name, value):
+        return self._output_field(name).to_python(value)
+
+    def _output_field(self, name):
+        query = self.object_list.query
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _seek(self, values, backwards):
+        """Условие «строго после ключа» в порядке сортировки страницы."""
+        conditions = []
+        fields = self._fields()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            equal = {
+                fields[i]: values[i] for i in range(position)
+            }
+            equal[f'{fields[position]}__{lookup}'] = values[position]
+            conditions.append(Q(**equal))
+        return reduce(operator.or_, conditions)
+
+    def _encode(self, obj, backwards):
+        # DjangoJSONEncoder обрезает микросекунды, а ключ должен быть точным.
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in (getattr(obj, name) for name in self._fields())
+        ]
+        payload = json.dumps([int(backwards), values], separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def _decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            backwards, raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            fields = self._fields()
+            if len(raw_values) != len(fields):
+                raise ValueError
+            values = [
+                self._to_python(name, value)
+                for name, value in zip(fields, raw_values)
+            ]
+        except (binascii.Error, TypeError, ValueError,
+                ValidationError) as error:
+            raise InvalidCursor('Некорректный курсор страницы') from error
+        return bool(backwards), values
+
+
+def estimated_count(model):
+    """Число строк таблицы по статистике базы или None, если её нет.
+
+    SQLite хранит его в ``sqlite_stat1`` после ANALYZE, PostgreSQL —
+    в ``pg_class.reltuples``.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Таблица статистики появляется только после первого ANALYZE.
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    # В sqlite_stat1 первое число строки — сколько записей в таблице.
+    value = int(float(str(row[0]).split()[0]))
+    return value if value >= 0 else None
+
+
+class CountedPaginator(Paginator):
+    """Нумерованная пагинация без COUNT(*) на каждый запрос.
+
+    Число записей берётся, по порядку:
+
+    * из ``count`` — готового счётчика (``Group.posts_count``,
+      ``UserStats.posts_count``);
+    * из кэша под поколением ленты ``feed``: новый или удалённый пост
+      увеличивает поколение, и число считается заново. Для ленты
+      без фильтров вместо COUNT(*) берётся оценка по статистике таблицы,
+      если она не меньше ``PAGINATOR_ESTIMATE_THRESHOLD``: ошибка
+      в сотню строк на миллионе незаметна в номерах страниц;
+    * COUNT(*), если нет ни того, ни другого.
+
+    У страниц есть ``page_range_window`` — номера вокруг текущей
+    и по краям с ``ELLIPSIS`` на месте пропусков.
+    """
+    on_each_side = 2
+    on_ends = 1
+
+    def __init__(self, object_list, per_page, count=None, feed=None):
+        super().__init__(object_list, per_page)
+        self._known_count = count
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        if self._known_count is not None:
+            return self._known_count
+        if self.feed is None:
+            return Paginator.count.func(self)
+        (version,) = feed_cache.get_versions(self.feed)
+        key = f'paginator-count:{self.feed}:{version}'
+        value = cache.get(key)
+        if value is None:
+            value = self._estimate()
+            if value is None:
+                value = Paginator.count.func(self)
+            cache.set(key, value, FEED_CACHE_TTL)
+        return value
+
+    def _estimate(self):
+        if self.object_list.query.has_filters():
+            return None
+        estimate = estimated_count(self.object_list.model)
+        if estimate is None or estimate < PAGINATOR_ESTIMATE_THRESHOLD:
+            return None
+        return estimate
+
+    def page_window(self, number):
+        """Номера страниц вокруг ``number`` и по краям, пропуски — ELLIPSIS."""
+        if self.num_pages <= (self.on_each_side + self.on_ends) * 2 + 1:
+            return list(self.page_range)
+        window = []
+        left = max(number - self.on_each_side, 1)
+        right = min(number + self.on_each_side, self.num_pages)
+        if left > self.on_ends + 1:
+            window.extend(range(1, self.on_ends + 1))
+            window.append(ELLIPSIS)
+        else:
+            left = 1
+        window.extend(range(left, right + 1))
+        if right < self.num_pages - self.on_ends:
+            window.append(ELLIPSIS)
+            window.extend(range(
+                self.num_pages - self.on_ends + 1, self.num_pages + 1
+            ))
+        else:
+            window.extend(range(right + 1, self.num_pages + 1))
+        return window
+
+    def page(self, number):
+        page = super().page(number)
+        page.page_range_window = self.page_window(page.number)
+        return page
@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as feed_cache
+from . import counters, follow_actions, fulltext, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+DISPLAY_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.deliver_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def deliver_followed_posts(sender, instance, created, **kwargs):
+    # Лента, счётчики и кэш — так же, как при подписке через follow_actions.
+    if created:
+        follow_actions.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def withdraw_followed_posts(sender, instance, **kwargs):
+    follow_actions.unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    # Пост, перенесённый в другую группу, должен пропасть из старой ленты.
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    feeds = [
+        feed_cache.INDEX,
+        feed_cache.profile_feed(instance.author_id),
+        feed_cache.post_page(instance.pk),
+    ]
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    }
+    feeds.extend(
+        feed_cache.group_feed(group_id)
+        for group_id in group_ids if group_id is not None
+    )
+    feed_cache.bump(*feeds)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_page(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.post_page(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    # Название и адрес группы выводятся в карточках всех лент.
+    feed_cache.bump(feed_cache.SITE)
+
+
+@receiver(pre_save, sender=User)
+def remember_display_name(sender, instance, update_fields=None, **kwargs):
+    instance._display_name_changed = False
+    if instance.pk is None:
+        return
+    # Вход пользователя обновляет только last_login — без лишнего запроса.
+    if update_fields and not set(update_fields) & set(DISPLAY_NAME_FIELDS):
+        return
+    previous = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*DISPLAY_NAME_FIELDS).first()
+    current = tuple(getattr(instance, field) for field in DISPLAY_NAME_FIELDS)
+    instance._display_name_changed = previous != current
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, **kwargs):
+    if getattr(instance, '_display_name_changed', False):
+        feed_cache.bump(feed_cache.SITE)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created or previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            counters.change_group_counter(previous_group_id, -1)
+        if instance.group_id is not None:
+            counters.change_group_counter(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+    if instance.group_id is not None:
+        counters.change_group_counter(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.author_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fulltext.reindex_post.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    fulltext.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fulltext.reindex_comment.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    fulltext.remove_comment(instance.pk)
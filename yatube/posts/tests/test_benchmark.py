@@ -0,0 +1,95 @@
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+
+from .. import benchmark, follow_actions
+from ..management.commands.benchmark import Command
+from ..models import Post
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(60)
+
+    def test_seed_builds_derived_data(self):
+        post = Post.objects.filter(author__following__isnull=False).first()
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(post.timeline_entries.exists())
+        self.assertEqual(
+            post.author.stats.posts_count, post.author.posts.count()
+        )
+
+    def test_every_route_is_measured(self):
+        results = benchmark.measure(iterations=2)
+        self.assertEqual(len(results), sum(
+            len(module.urlpatterns) for module in benchmark.URL_MODULES
+        ))
+        for name, row in results.items():
+            with self.subTest(name=name):
+                self.assertLess(row['status'], 400)
+                self.assertGreater(row['queries'], 0)
+                self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+        # Адреса удаления откатываются и не портят набор данных.
+        self.assertEqual(Post.objects.count(), 60)
+
+    def test_follow_routes_write(self):
+        """Подписка и отписка замеряются на настоящей записи в Follow."""
+        changed = {}
+
+        def recorder(action):
+            original = getattr(follow_actions, action)
+
+            def record(user_id, usernames):
+                result = original(user_id, usernames)
+                if user_id == follower.pk:
+                    changed.setdefault(action, []).append(result)
+                return result
+            return mock.patch.object(follow_actions, action, record)
+
+        post, _ = benchmark.sample_objects()
+        follower = benchmark.sample_follower(post.author)
+        with recorder('follow'), recorder('unfollow'):
+            benchmark.measure(iterations=2)
+        for action in ('follow', 'unfollow'):
+            with self.subTest(action=action):
+                self.assertTrue(all(changed[action]))
+
+    def test_command_uses_throwaway_cache(self):
+        caches = Command().throwaway_caches('/tmp/benchmark')
+        self.assertEqual(set(caches), set(settings.CACHES))
+        for config in caches.values():
+            self.assertEqual(
+                os.path.dirname(config['LOCATION']), '/tmp/benchmark'
+            )
+
+    def test_compare_reports_regressions(self):
+        baseline = {'posts:main_page': {
+            'status': 200, 'p95_ms': 10, 'queries': 3, 'peak_kb': 100,
+        }}
+        self.assertEqual(benchmark.compare(
+            {'posts:main_page': {
+                'status': 200, 'p95_ms': 12, 'queries': 3, 'peak_kb': 120,
+            }},
+            baseline,
+        ), [])
+        regressions = benchmark.compare(
+            {'posts:main_page': {
+                'status': 200, 'p95_ms': 20, 'queries': 4, 'peak_kb': 100,
+            }},
+            baseline,
+        )
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(len(benchmark.compare({}, baseline)), 1)
+
+    def test_compare_reports_routes_missing_from_baseline(self):
+        row = {'status': 200, 'p95_ms': 10, 'queries': 3, 'peak_kb': 100}
+        regressions = benchmark.compare(
+            {'posts:main_page': row, 'posts:search': row},
+            {'posts:main_page': row},
+        )
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('posts:search', regressions[0])
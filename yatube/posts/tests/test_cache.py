@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import ENTRIES_PER_PAGE
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Dmitriy',
+            first_name='Дмитрий',
+        )
+        cls.group = Group.objects.create(
+            title='Title',
+            slug='test_slug',
+            description='Description',
+        )
+        for i in range(ENTRIES_PER_PAGE + 1):
+            Post.objects.create(
+                text=f'Post number {i}',
+                author=cls.user,
+                group=cls.group,
+            )
+        cls.feeds = (
+            reverse('posts:main_page'),
+            reverse('posts:groups', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_pages_are_cached_separately(self):
+        """Каждая страница ленты кэшируется под своим ключом."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(url, {'page': 2})
+                self.assertNotIn('Post number 0', first.content.decode())
+                self.assertIn('Post number 0', second.content.decode())
+
+    def test_new_post_shows_immediately(self):
+        """Новый пост сразу появляется во всех лентах."""
+        for url in self.feeds:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Fresh post',
+            author=self.user,
+            group=self.group,
+        )
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Fresh post', response.content.decode())
+
+    def test_post_moved_to_other_group(self):
+        """Пост, перенесённый в другую группу, пропадает из старой."""
+        url = reverse('posts:groups', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        post = Post.objects.first()
+        post.group = Group.objects.create(
+            title='Other', slug='other', description='Description'
+        )
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertNotIn(post, response.context['page_obj'])
+        self.assertNotIn(post.text, response.content.decode())
+
+    def test_group_and_author_renames_invalidate_cards(self):
+        """Смена названия группы и имени автора видна в лентах."""
+        url = reverse('posts:main_page')
+        self.guest_client.get(url)
+        self.group.title = 'Renamed group'
+        self.group.save()
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        content = self.guest_client.get(url).content.decode()
+        self.assertIn('Renamed group', content)
+        self.assertIn('Переименованный', content)
+
+    def test_login_keeps_cache(self):
+        """Вход пользователя не сбрасывает кэш лент."""
+        url = reverse('posts:main_page')
+        content_old = self.guest_client.get(url).content
+        Post.objects.filter(author=self.user).update(text='changed')
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.guest_client.get(url).content, content_old)
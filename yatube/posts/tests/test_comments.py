@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import COMMENTS_PER_PAGE
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class LazyCommentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Автора'
+        )
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        for i in range(COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}'
+            )
+        cls.expected = list(
+            cls.post.comments.order_by('-pub_date', '-pk')
+        )
+        cls.detail_url = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.comments_url = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_detail_renders_first_batch(self):
+        """Страница поста выводит только первую порцию комментариев."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.expected[:COMMENTS_PER_PAGE])
+        self.assertContains(response, 'Показать ещё')
+        self.assertContains(
+            response, f'{self.comments_url}?cursor={comments.next_cursor}'
+        )
+        self.assertNotContains(
+            response, self.expected[COMMENTS_PER_PAGE].text + '\n'
+        )
+
+    def test_detail_query_count_does_not_depend_on_comments(self):
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.detail_url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text='Ещё')
+            for _ in range(COMMENTS_PER_PAGE)
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(self.detail_url)
+        self.assertEqual(len(before), len(after))
+
+    def test_next_batch_html(self):
+        cursor = self.client.get(
+            self.detail_url
+        ).context['comments'].next_cursor
+        response = self.client.get(self.comments_url, {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            list(response.context['comments']),
+            self.expected[COMMENTS_PER_PAGE:],
+        )
+        self.assertNotContains(response, 'Показать ещё')
+        self.assertContains(response, 'Удалить')
+
+    def test_next_batch_json(self):
+        response = self.client.get(self.comments_url, {'format': 'json'})
+        data = response.json()
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            [comment.pk for comment in self.expected[:COMMENTS_PER_PAGE]],
+        )
+        self.assertEqual(data['results'][0]['author_name'], 'Имя Автора')
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            [comment.pk for comment in self.expected[COMMENTS_PER_PAGE:]],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[10 ** 6])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_anonymous_batch_purged_by_new_comment(self):
+        guest = Client()
+        guest.get(self.comments_url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий'
+        )
+        self.assertContains(
+            guest.get(self.comments_url), 'Свежий комментарий'
+        )
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:groups', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_anonymous_headers(self):
+        """Анонимам уходят валидаторы и публичный Cache-Control."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('"'))
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший If-None-Match — 304 без выборки страницы.
+
+        Из кэша страниц 304 уходит вовсе без запросов, без него — после
+        одной агрегатной выборки.
+        """
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                self.assertLessEqual(len(queries), 1)
+                for query in queries.captured_queries:
+                    self.assertNotIn('"posts_post"."text"', query['sql'])
+
+    def test_if_modified_since_ignored(self):
+        """Правка не меняет pub_date, поэтому по дате 304 не отдаётся."""
+        url = self.urls[0]
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 31 Dec 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_etag_changes_with_data(self):
+        """Правка поста, новый комментарий и подписка меняют ETag."""
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Исправленный пост')
+        detail, profile = self.urls[3], self.urls[2]
+        etag = self.guest_client.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(
+            self.guest_client.get(
+                detail, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200,
+        )
+        etag = self.guest_client.get(profile)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.guest_client.get(
+                profile, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200,
+        )
+
+    def test_authorized_responses_are_private(self):
+        client = Client()
+        client.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_missing_objects(self):
+        for url in (
+            reverse('posts:groups', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
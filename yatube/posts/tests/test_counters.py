@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Dmitriy')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Title',
+            slug='test_slug',
+            description='Description',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def _stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняют счётчики автора и группы."""
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Text', 'group': self.group.pk},
+        )
+        post = Post.objects.get(author=self.user)
+        self.group.refresh_from_db()
+        self.assertEqual(self._stats(self.user).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.client.get(
+            reverse('posts:post_delete', kwargs={'post_id': post.pk})
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self._stats(self.user).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_moving_post_between_groups(self):
+        """Смена группы поста переносит его в счётчике групп."""
+        post = Post.objects.create(
+            text='Text', author=self.user, group=self.group
+        )
+        other = Group.objects.create(
+            title='Other', slug='other', description='Description'
+        )
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Text', 'group': other.pk},
+        )
+        self.group.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(other.posts_count, 1)
+
+    def test_comment_counters(self):
+        """Комментарии учитываются в счётчике автора комментария."""
+        post = Post.objects.create(text='Text', author=self.author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Comment'},
+        )
+        self.assertEqual(self._stats(self.user).comments_count, 1)
+        comment = Comment.objects.get()
+        self.client.get(reverse(
+            'posts:delete_comment',
+            kwargs={'post_id': post.pk, 'comment_id': comment.pk}
+        ))
+        self.assertEqual(self._stats(self.user).comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        url_kwargs = {'username': self.author.username}
+        self.client.get(reverse('posts:profile_follow', kwargs=url_kwargs))
+        self.assertEqual(self._stats(self.user).following_count, 1)
+        self.assertEqual(self._stats(self.author).followers_count, 1)
+        response = self.client.get(
+            reverse('posts:profile', kwargs=url_kwargs)
+        )
+        self.assertEqual(response.context['stats'].followers_count, 1)
+        self.client.get(reverse('posts:profile_unfollow', kwargs=url_kwargs))
+        self.assertEqual(self._stats(self.user).following_count, 0)
+        self.assertEqual(self._stats(self.author).followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount восстанавливает разошедшиеся счётчики."""
+        Post.objects.create(text='Text', author=self.user, group=self.group)
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        UserStats.objects.filter(user=self.author).delete()
+        Group.objects.update(posts_count=0)
+        call_command('recount', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self._stats(self.user).posts_count, 1)
+        self.assertEqual(self._stats(self.author).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 1)
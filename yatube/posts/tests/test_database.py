@@ -0,0 +1,68 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+WRITERS = 8
+COMMENTS_PER_WRITER = 5
+
+
+class SQLiteSettingsTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Прагмы настраиваются только для SQLite')
+        self.author = User.objects.create_user(username='Dmitriy')
+        self.post = Post.objects.create(text='Text', author=self.author)
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL.
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_concurrent_comment_writers(self):
+        """Параллельные add_comment не падают с «database is locked»."""
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        users = [
+            User.objects.create_user(username=f'writer{i}')
+            for i in range(WRITERS)
+        ]
+        start = threading.Barrier(WRITERS)
+        errors = []
+
+        def write(user):
+            client = Client()
+            client.force_login(user)
+            start.wait()
+            try:
+                for i in range(COMMENTS_PER_WRITER):
+                    response = client.post(url, {'text': f'Comment {i}'})
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=write, args=(user,)) for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Comment.objects.filter(post=self.post).count(),
+            WRITERS * COMMENTS_PER_WRITER,
+        )
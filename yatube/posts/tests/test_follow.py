@@ -1,12 +1,19 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Post
+from ..models import Follow, Post, TimelineEntry
 
 User = get_user_model()
 
 
+@override_settings(JOBS_EAGER=True)
 class FollowPageTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -47,3 +54,231 @@ class FollowPageTest(TestCase):
             new_post,
             response.context['page_obj']
         )
+
+
+@override_settings(JOBS_EAGER=True)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Dmitriy')
+        cls.follower = Client()
+        cls.follower.force_login(cls.user)
+        cls.author = User.objects.create(username='Author')
+
+    def _feed(self):
+        response = self.follower.get(reverse('posts:follow'))
+        return list(response.context['page_obj'])
+
+    def test_follow_delivers_existing_posts(self):
+        """После подписки в ленте появляются уже опубликованные посты."""
+        old_post = Post.objects.create(text='Old', author=self.author)
+        self.follower.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self._feed(), [old_post])
+
+    def test_unfollow_removes_posts(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='Text', author=self.author)
+        self.follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self._feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+
+    def test_deleted_post_leaves_timeline(self):
+        """Удалённый пост удаляется и из лент подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Text', author=self.author)
+        post.delete()
+        self.assertEqual(self._feed(), [])
+
+    def test_backfill_command(self):
+        """Команда backfill_timeline восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Text', author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertEqual(self._feed(), [post])
+
+
+class FollowButtonsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.followed = User.objects.create_user(username='followed')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.followed)
+        for author in (cls.followed, cls.other, cls.reader):
+            Post.objects.create(text=f'Пост {author}', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_cards_show_follow_state(self):
+        """Карточки ленты показывают, подписан ли зритель на автора."""
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=[self.followed.username])
+        )
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=[self.other.username])
+        )
+        self.assertNotContains(
+            response,
+            reverse('posts:profile_follow', args=[self.reader.username])
+        )
+
+    def test_follow_state_is_one_lookup(self):
+        """Подписки страницы — один запрос, потом — из кэша."""
+        url = reverse('posts:main_page')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        follow_queries = [
+            query for query in queries.captured_queries
+            if 'posts_follow' in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:profile',
+                                    args=[self.followed.username]))
+        self.assertFalse(any(
+            'posts_follow' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_toggle_updates_cards(self):
+        url = reverse('posts:main_page')
+        self.client.get(url)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.other.username])
+        )
+        self.assertContains(
+            self.client.get(url),
+            reverse('posts:profile_unfollow', args=[self.other.username])
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.followed.username])
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=[self.followed.username])
+        )
+        self.assertFalse(response.context['following'])
+        self.assertContains(
+            self.client.get(url),
+            reverse('posts:profile_follow', args=[self.followed.username])
+        )
+
+    def test_anonymous_cards_have_no_buttons(self):
+        response = Client().get(reverse('posts:main_page'))
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+
+
+@override_settings(JOBS_EAGER=True)
+class FollowActionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text=f'Пост {author}', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def _bulk(self, action, *usernames):
+        return self.client.post(
+            reverse('posts:follow_bulk'),
+            {'username': list(usernames), 'action': action},
+        )
+
+    def test_bulk_follow(self):
+        """Подписка на нескольких авторов сразу возвращает счётчики."""
+        response = self._bulk(
+            'follow', 'author0', 'author1', 'reader', 'nobody'
+        )
+        self.assertEqual(response.json(), {
+            'changed': ['author0', 'author1'],
+            'following_count': 2,
+            'followers_count': {'author0': 1, 'author1': 1},
+        })
+        self.assertEqual(
+            set(Follow.objects.values_list('author__username', flat=True)),
+            {'author0', 'author1'},
+        )
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader
+        ).count(), 2)
+        response = self.client.get(
+            reverse('posts:profile_following', args=['reader'])
+        )
+        self.assertEqual(
+            response.context['users'], self.authors[1::-1]
+        )
+
+    def test_repeated_follow_changes_nothing(self):
+        self._bulk('follow', 'author0')
+        response = self._bulk('follow', 'author0', 'author2')
+        self.assertEqual(response.json()['changed'], ['author2'])
+        self.assertEqual(response.json()['following_count'], 2)
+        self.assertEqual(Follow.objects.count(), 2)
+
+    def test_bulk_unfollow(self):
+        self._bulk('follow', 'author0', 'author1', 'author2')
+        response = self._bulk('unfollow', 'author0', 'author1', 'nobody')
+        self.assertEqual(response.json(), {
+            'changed': ['author0', 'author1'],
+            'following_count': 1,
+            'followers_count': {'author0': 0, 'author1': 0},
+        })
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list(
+                'author__username', flat=True
+            )),
+            ['author2'],
+        )
+
+    def test_unknown_author_not_found(self):
+        for name in ('profile_follow', 'profile_unfollow'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(f'posts:{name}', args=['nobody'])
+                )
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('posts:profile_unfollow', args=['author0'])
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_bad_requests(self):
+        self.assertEqual(self._bulk('block', 'author0').status_code, 400)
+        self.assertEqual(self._bulk('follow').status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_bulk')).status_code, 405
+        )
+
+    @override_settings(JOBS_EAGER=False)
+    def test_toggle_writes_without_reading_first(self):
+        """Подписка и отписка — одна запись в Follow без SELECT перед ней."""
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse(name, args=['author0']))
+                follow_queries = [
+                    q['sql'] for q in queries if 'posts_follow' in q['sql']
+                ]
+                self.assertEqual(len(follow_queries), 1)
+                self.assertFalse(follow_queries[0].startswith('SELECT'))
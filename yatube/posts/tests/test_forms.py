@@ -1,8 +1,14 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
 from django.urls import reverse
 
+from core.models import Job
+
+from .. import views
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -110,6 +116,23 @@ class PostFormsTests(TestCase):
         self.assertEqual(object.author, post_author)
         self.assertTrue(object.image)
 
+    @override_settings(JOBS_EAGER=False)
+    def test_failed_create_leaves_no_jobs(self):
+        """Пост и задачи его сигналов фиксируются или откатываются вместе."""
+        posts_count = Post.objects.count()
+        jobs_count = Job.objects.count()
+        with mock.patch(
+            'posts.views.thumbnails.schedule', side_effect=RuntimeError
+        ):
+            request = RequestFactory().post(
+                reverse('posts:post_create'), data={'text': 'Откат'}
+            )
+            request.user = self.user
+            with self.assertRaises(RuntimeError):
+                views.post_create(request)
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertEqual(Job.objects.count(), jobs_count)
+
     def test_guest_client_create_post_redirect(self):
         """Неавторизованный пользователь, не может создать пост."""
         post_count = Post.objects.count()
@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol, cls.dave, cls.erin = (
+            User.objects.create_user(username=name)
+            for name in ('alice', 'bob', 'carol', 'dave', 'erin')
+        )
+        for user, author in (
+            (cls.alice, cls.bob),
+            (cls.alice, cls.carol),
+            (cls.bob, cls.alice),
+            (cls.bob, cls.dave),
+            (cls.carol, cls.dave),
+            (cls.carol, cls.erin),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lists_newest_first(self):
+        self.assertEqual(
+            list(graph.following(self.alice.pk)),
+            [self.carol.pk, self.bob.pk],
+        )
+        self.assertEqual(
+            list(graph.followers(self.dave.pk)),
+            [self.carol.pk, self.bob.pk],
+        )
+        self.assertEqual(len(graph.followers(self.erin.pk)), 1)
+        self.assertEqual(list(graph.following(self.erin.pk)), [])
+
+    def test_cached_lists_skip_follow_table(self):
+        graph.following(self.alice.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn(self.bob.pk, graph.following(self.alice.pk))
+        self.assertFalse(
+            [q for q in queries if 'posts_follow' in q['sql']]
+        )
+
+    def test_follow_and_unfollow_invalidate(self):
+        self.assertNotIn(self.erin.pk, graph.following(self.alice.pk))
+        self.assertNotIn(self.alice.pk, graph.followers(self.erin.pk))
+        follow = Follow.objects.create(user=self.alice, author=self.erin)
+        self.assertIn(self.erin.pk, graph.following(self.alice.pk))
+        self.assertIn(self.alice.pk, graph.followers(self.erin.pk))
+        follow.delete()
+        self.assertNotIn(self.erin.pk, graph.following(self.alice.pk))
+        self.assertNotIn(self.alice.pk, graph.followers(self.erin.pk))
+
+    def test_is_mutual(self):
+        self.assertTrue(graph.is_mutual(self.alice.pk, self.bob.pk))
+        self.assertTrue(graph.is_mutual(self.bob.pk, self.alice.pk))
+        self.assertFalse(graph.is_mutual(self.alice.pk, self.carol.pk))
+
+    def test_suggestions(self):
+        # Дейва читают и Боб, и Кэрол, Эрин — только Кэрол; сама Алиса
+        # и её подписки в рекомендации не попадают.
+        self.assertEqual(
+            graph.suggestions(self.alice.pk),
+            [(self.dave.pk, 2), (self.erin.pk, 1)],
+        )
+        self.assertEqual(
+            graph.suggestions(self.alice.pk, limit=1), [(self.dave.pk, 2)]
+        )
+
+    def test_suggestions_load_lists_in_one_query(self):
+        graph.following(self.alice.pk)
+        with CaptureQueriesContext(connection) as queries:
+            graph.suggestions(self.alice.pk)
+        self.assertEqual(
+            len([q for q in queries if 'posts_follow' in q['sql']]), 1
+        )
+
+
+class FollowListPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.fans = [
+            User.objects.create_user(username=f'fan{i}') for i in range(11)
+        ]
+        for fan in cls.fans:
+            Follow.objects.create(user=fan, author=cls.owner)
+        Follow.objects.create(user=cls.friend, author=cls.owner)
+        Follow.objects.create(user=cls.owner, author=cls.friend)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.owner)
+
+    def test_followers_paginated_newest_first(self):
+        url = reverse('posts:profile_followers', args=[self.owner.username])
+        response = self.client.get(url)
+        users = response.context['users']
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual(users[0], self.friend)
+        self.assertTrue(users[0].is_mutual)
+        self.assertFalse(users[1].is_mutual)
+        self.assertEqual(len(users), 10)
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(
+            response.context['users'], [self.fans[1], self.fans[0]]
+        )
+
+    def test_following_page(self):
+        response = self.client.get(
+            reverse('posts:profile_following', args=[self.owner.username])
+        )
+        self.assertEqual(response.context['users'], [self.friend])
+        self.assertTrue(response.context['users'][0].is_mutual)
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=[self.friend.username]),
+        )
+
+    def test_unknown_user(self):
+        response = self.client.get(
+            reverse('posts:profile_followers', args=['nobody'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_suggestions_page(self):
+        fan = Client()
+        fan.force_login(self.fans[0])
+        response = fan.get(reverse('posts:follow_suggestions'))
+        self.assertEqual(response.context['users'], [self.friend])
+        response = self.client.get(reverse('posts:follow_suggestions'))
+        self.assertEqual(response.context['users'], [])
+        Follow.objects.create(user=self.friend, author=self.fans[0])
+        response = self.client.get(reverse('posts:follow_suggestions'))
+        self.assertEqual(response.context['users'], [self.fans[0]])
+        self.assertEqual(response.context['users'][0].common_follows, 1)
+
+    def test_suggestions_require_login(self):
+        response = Client().get(reverse('posts:follow_suggestions'))
+        self.assertEqual(response.status_code, 302)
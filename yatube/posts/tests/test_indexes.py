@@ -0,0 +1,89 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import ENTRIES_PER_PAGE
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?(posts|auth)_\w+$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Title',
+            slug='test_slug',
+            description='Description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(ENTRIES_PER_PAGE * 2):
+            cls.post = Post.objects.create(
+                text='Text', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                text='Comment', author=cls.user, post=cls.post
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def _feed_urls(self):
+        urls = [
+            reverse('posts:main_page'),
+            reverse('posts:groups', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.author.username}
+            ),
+            reverse('posts:follow'),
+        ]
+        pages = []
+        for url in urls:
+            page_obj = self.client.get(url).context['page_obj']
+            pages += [
+                url,
+                f'{url}?page=2',
+                f'{url}?cursor={page_obj.next_cursor}',
+            ]
+        pages.append(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        return pages
+
+    def _plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не сканируют таблицы и не сортируют во временном
+        B-дереве."""
+        for url in self._feed_urls():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                for step in self._plan(sql):
+                    with self.subTest(url=url, sql=sql, step=step):
+                        self.assertNotIn(TEMP_SORT, step)
+                        self.assertIsNone(FULL_SCAN.search(step))
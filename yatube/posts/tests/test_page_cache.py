@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост автора'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.other, group=cls.other_group, text='Другой пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.pages = {
+            'index': reverse('posts:main_page'),
+            'group': reverse('posts:groups', args=[self.group.slug]),
+            'other_group': reverse(
+                'posts:groups', args=[self.other_group.slug]
+            ),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'other_profile': reverse(
+                'posts:profile', args=[self.other.username]
+            ),
+            'post': reverse('posts:post_detail', args=[self.post.pk]),
+            'other_post': reverse(
+                'posts:post_detail', args=[self.other_post.pk]
+            ),
+        }
+        for url in self.pages.values():
+            self.guest_client.get(url)
+
+    def assertCached(self, name, cached=True):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(self.pages[name])
+        self.assertEqual(response.status_code, 200)
+        if cached:
+            self.assertEqual(len(queries), 0, f'{name} не из кэша')
+        else:
+            self.assertGreater(len(queries), 0, f'{name} из кэша')
+        return response
+
+    def test_hit_skips_view(self):
+        """Повторный запрос анонима обходится без базы."""
+        for name, url in self.pages.items():
+            with self.subTest(page=name):
+                response = self.assertCached(name)
+                self.assertEqual(
+                    response.content, self.guest_client.get(url).content
+                )
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_not_modified_from_cache(self):
+        etag = self.guest_client.get(self.pages['index'])['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                self.pages['index'], HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 0)
+
+    def test_query_string_is_part_of_key(self):
+        url = self.pages['index']
+        self.assertEqual(self.guest_client.get(url, {'page': 1}).status_code,
+                         200)
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'page': 2})
+        self.assertGreater(len(queries), 0)
+
+    def test_new_post_purges_its_feeds(self):
+        """Новый пост сбрасывает главную, профиль автора и его группу."""
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        for name in ('index', 'group', 'profile', 'post'):
+            with self.subTest(page=name):
+                response = self.assertCached(name, cached=False)
+                if name != 'post':
+                    self.assertContains(response, 'Новый пост')
+        for name in ('other_group', 'other_profile', 'other_post'):
+            with self.subTest(page=name):
+                self.assertCached(name)
+
+    def test_comment_purges_only_its_post(self):
+        Comment.objects.create(
+            post=self.post, author=self.other, text='Новый комментарий'
+        )
+        response = self.assertCached('post', cached=False)
+        self.assertContains(response, 'Новый комментарий')
+        for name in ('index', 'group', 'profile', 'other_post'):
+            with self.subTest(page=name):
+                self.assertCached(name)
+
+    def test_follow_purges_profile_counters(self):
+        Follow.objects.create(user=self.other, author=self.author)
+        for name in ('profile', 'other_profile'):
+            with self.subTest(page=name):
+                self.assertCached(name, cached=False)
+        self.assertCached('index')
+
+    def test_authorized_pages_not_cached(self):
+        client = Client()
+        client.force_login(self.other)
+        client.get(self.pages['index'])
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.pages['index'])
+        self.assertGreater(len(queries), 0)
+        self.assertContains(response, self.other.username)
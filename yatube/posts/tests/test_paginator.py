@@ -1,12 +1,18 @@
 from math import ceil
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from yatube.settings import ENTRIES_PER_PAGE
 
-from ..models import Post
+from ..models import Group, Post
+from ..paginators import (ELLIPSIS, CountedPaginator, KeysetPaginator,
+                          estimated_count)
 
 User = get_user_model()
 
@@ -47,3 +53,158 @@ class PaginatorViewTests(TestCase):
             response.context['page_obj']),
             self.posts_last_page
         )
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Dmitriy')
+        cls.guest_client = Client()
+        Post.objects.bulk_create(
+            Post(text=f'Test {i}', author=cls.user) for i in range(13)
+        )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_without_page_number_uses_cursor(self):
+        """Без ?page= лента отдаётся курсорной страницей."""
+        response = self.guest_client.get(reverse('posts:main_page'))
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.paginator, KeysetPaginator)
+        self.assertEqual(list(page_obj), self.expected[:ENTRIES_PER_PAGE])
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+
+    def test_next_and_previous_cursors(self):
+        """Курсоры ведут на соседние страницы в обе стороны."""
+        url = reverse('posts:main_page')
+        first = self.guest_client.get(url).context['page_obj']
+        second = self.guest_client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(second), self.expected[ENTRIES_PER_PAGE:])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        back = self.guest_client.get(
+            url, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), self.expected[:ENTRIES_PER_PAGE])
+        self.assertFalse(back.has_previous())
+
+    def test_page_does_not_count_rows(self):
+        """Курсорная страница выбирается одним запросом без COUNT(*)."""
+        paginator = KeysetPaginator(Post.objects.all(), ENTRIES_PER_PAGE)
+        cursor = paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            paginator.page(cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Некорректный курсор не ломает страницу."""
+        response = self.guest_client.get(
+            reverse('posts:main_page'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.expected[:ENTRIES_PER_PAGE]
+        )
+
+
+class CountedPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(ENTRIES_PER_PAGE + 3):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.user, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page': 2})
+        counts = [
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        return response, counts
+
+    def test_index_count_cached_per_feed_version(self):
+        """COUNT(*) главной считается один раз на поколение ленты."""
+        url = reverse('posts:main_page')
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(len(response.context['page_obj']), 3)
+        _, counts = self.count_queries(url)
+        self.assertEqual(counts, [])
+        Post.objects.create(text='Новый пост', author=self.user)
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         ENTRIES_PER_PAGE + 4)
+
+    def test_group_and_profile_use_counters(self):
+        for url in (
+            reverse('posts:groups', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ):
+            with self.subTest(url=url):
+                response, counts = self.count_queries(url)
+                self.assertEqual(counts, [])
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count,
+                    ENTRIES_PER_PAGE + 3,
+                )
+
+    def test_large_feed_uses_estimate(self):
+        with mock.patch(
+            'posts.paginators.estimated_count', return_value=10 ** 6
+        ):
+            response, counts = self.count_queries(
+                reverse('posts:main_page')
+            )
+        self.assertEqual(counts, [])
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 10 ** 6)
+        self.assertContains(response, ELLIPSIS)
+        self.assertContains(response, f'?page={page_obj.paginator.num_pages}')
+        self.assertNotContains(response, '?page=50"')
+
+    def test_filtered_feed_is_not_estimated(self):
+        paginator = CountedPaginator(
+            Post.objects.filter(group=self.group), ENTRIES_PER_PAGE,
+            feed='test',
+        )
+        with mock.patch(
+            'posts.paginators.estimated_count', return_value=10 ** 6
+        ):
+            self.assertEqual(paginator.count, ENTRIES_PER_PAGE + 3)
+
+    def test_estimated_count_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_count(Post), Post.objects.count())
+
+    def test_page_window(self):
+        paginator = CountedPaginator(
+            Post.objects.all(), ENTRIES_PER_PAGE, count=ENTRIES_PER_PAGE * 20
+        )
+        expected = {
+            1: [1, 2, 3, ELLIPSIS, 20],
+            5: [1, ELLIPSIS, 3, 4, 5, 6, 7, ELLIPSIS, 20],
+            4: [1, 2, 3, 4, 5, 6, ELLIPSIS, 20],
+            20: [1, ELLIPSIS, 18, 19, 20],
+        }
+        for number, window in expected.items():
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page_window(number), window)
+        short = CountedPaginator(
+            Post.objects.all(), ENTRIES_PER_PAGE, count=ENTRIES_PER_PAGE * 7
+        )
+        self.assertEqual(short.page_window(4), list(range(1, 8)))
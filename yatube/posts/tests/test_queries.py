@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.settings import ENTRIES_PER_PAGE
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=True)
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Title',
+            slug='test_slug',
+            description='Description',
+        )
+        # у каждого поста свой автор и группа — худший случай для N+1
+        for i in range(ENTRIES_PER_PAGE + 3):
+            author = User.objects.create_user(
+                username=f'author_{i}',
+                first_name='Имя',
+                last_name=f'Фамилия {i}',
+            )
+            group = Group.objects.create(
+                title=f'Group {i}',
+                slug=f'group_{i}',
+                description='Description',
+            )
+            Post.objects.create(text='Text', author=author, group=group)
+            Post.objects.create(text='Text', author=author, group=cls.group)
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.author = author
+        for group in Group.objects.all():
+            Post.objects.create(text='Text', author=cls.author, group=group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_guest_feeds_query_budget(self):
+        """Число запросов страницы ленты не зависит от числа постов."""
+        # первый запрос каждой ленты — агрегат для ETag
+        feeds = {
+            # страница постов
+            reverse('posts:main_page'): 2,
+            # группа и страница постов
+            reverse('posts:groups', kwargs={'slug': self.group.slug}): 3,
+            # автор со счётчиками и страница постов
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.author.username}
+            ): 3,
+        }
+        for url, budget in feeds.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = self.guest_client.get(url)
+                self.assertEqual(
+                    len(response.context['page_obj']), ENTRIES_PER_PAGE
+                )
+
+    def test_follow_feed_query_budget(self):
+        """Лента подписок: сессия, пользователь и страница постов."""
+        with self.assertNumQueries(3):
+            response = self.reader_client.get(reverse('posts:follow'))
+        self.assertEqual(len(response.context['page_obj']), ENTRIES_PER_PAGE)
@@ -0,0 +1,137 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.settings import ENTRIES_PER_PAGE
+
+from .. import fulltext
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=True)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Dmitriy')
+        cls.best = Post.objects.create(
+            text='Котики, котики и ещё раз котики', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Про собак и немного про котиков', author=cls.user
+        )
+        cls.commented = Post.objects.create(
+            text='Пост без ключевого слова', author=cls.user
+        )
+        Comment.objects.create(
+            post=cls.commented, author=cls.user, text='А где <котики>?'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_ranked_results_with_snippets(self):
+        """Посты найдены по тексту и комментариям, лучший — первым."""
+        page = self.search('котик')
+        self.assertEqual(page[0], self.best)
+        self.assertEqual(
+            {post.pk for post in page},
+            {self.best.pk, self.other.pk, self.commented.pk},
+        )
+        found = {post.pk: post for post in page}
+        self.assertIn('<mark>', found[self.best.pk].search_snippet)
+        self.assertTrue(found[self.commented.pk].search_in_comment)
+        # Текст сниппета экранирован, подсветка — нет.
+        self.assertIn('&lt;<mark>котики</mark>&gt;',
+                      found[self.commented.pk].search_snippet)
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Только собаки'
+        post.save()
+        self.assertNotIn(post, list(self.search('котик')))
+        self.assertIn(post, list(self.search('собаки')))
+        Post.objects.get(pk=self.commented.pk).delete()
+        self.assertEqual(list(self.search('котик')), [self.best])
+
+    def test_keyset_pagination(self):
+        for i in range(ENTRIES_PER_PAGE + 1):
+            Post.objects.create(text=f'Пагинация {i}', author=self.user)
+        page = self.search('пагинация')
+        self.assertEqual(len(page), ENTRIES_PER_PAGE)
+        rest = self.search('пагинация', cursor=page.next_cursor)
+        self.assertEqual(len(rest), 1)
+        self.assertNotIn(rest[0], list(page))
+        back = self.search('пагинация', cursor=rest.previous_cursor)
+        self.assertEqual(list(back), list(page))
+
+    def test_pages_follow_best_hit_per_post(self):
+        """Страницы в обе стороны идут по лучшему совпадению поста, и пост
+        с совпадениями в комментариях не повторяется на других страницах."""
+        for i in range(ENTRIES_PER_PAGE * 2):
+            post = Post.objects.create(
+                text='ёж ' * (i % 4 + 1) + 'лес', author=self.user
+            )
+            for j in range(i % 3):
+                Comment.objects.create(
+                    post=post, author=self.user, text='ёж ' * (j + 2)
+                )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, MIN(rank) FROM {fulltext.TABLE} '
+                f'WHERE {fulltext.TABLE} MATCH %s GROUP BY post_id '
+                f'ORDER BY 2, 1',
+                [fulltext.match_expression('ёж')],
+            )
+            expected = [post_id for post_id, _ in cursor.fetchall()]
+        pages = [self.search('ёж')]
+        while pages[-1].next_cursor:
+            pages.append(self.search('ёж', cursor=pages[-1].next_cursor))
+        self.assertEqual(
+            [post.pk for page in pages for post in page], expected
+        )
+        for previous, page in zip(pages, pages[1:]):
+            back = self.search('ёж', cursor=page.previous_cursor)
+            self.assertEqual(list(back), list(previous))
+
+    def test_snippets_only_for_page(self):
+        """snippet() считается для строк страницы, а не всех совпадений."""
+        for i in range(ENTRIES_PER_PAGE + 5):
+            Post.objects.create(text=f'Сниппет {i}', author=self.user)
+        snippets = fulltext.SearchPaginator._snippets
+        with mock.patch.object(
+            fulltext.SearchPaginator, '_snippets', autospec=True,
+            side_effect=snippets,
+        ) as spy:
+            page = self.search('сниппет')
+        self.assertEqual(len(page), ENTRIES_PER_PAGE)
+        rowids = spy.call_args[0][1]
+        self.assertLessEqual(len(rowids), ENTRIES_PER_PAGE + 1)
+        self.assertTrue(all('<mark>' in post.search_snippet for post in page))
+
+    def test_operators_are_not_injected(self):
+        """Кавычки и операторы FTS5 из запроса не ломают поиск."""
+        for query in ('"котик', 'котик OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                self.assertIsNotNone(self.search(query))
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {fulltext.TABLE}')
+        self.assertEqual(list(self.search('котик')), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('котик')), 3)
@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from core.models import Job
+
+from .. import cache as feed_cache
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name='picture.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (64, 32), 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PregeneratedThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Dmitriy')
+        cls.post = Post.objects.create(
+            text='Text', author=cls.user, image=make_image()
+        )
+        cls.geometry, cls.options = thumbnails.THUMBNAIL_PRESETS[0]
+
+    def test_placeholder_until_ready(self):
+        """Пока миниатюра не нарезана, отдаётся заглушка."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            image = get_thumbnail(
+                self.post.image, self.geometry, **self.options
+            )
+        self.assertIsInstance(image, thumbnails.Placeholder)
+        self.assertTrue(image.url.endswith(thumbnails.THUMBNAIL_PLACEHOLDER))
+        schedule.assert_called_once_with(self.post.image.name)
+
+    def test_pregenerated_thumbnail_is_served(self):
+        """После фоновой нарезки шаблон получает готовую миниатюру."""
+        thumbnails.pregenerate(self.post.image.name)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            image = get_thumbnail(
+                self.post.image, self.geometry, **self.options
+            )
+        self.assertNotIsInstance(image, thumbnails.Placeholder)
+        self.assertTrue(default.storage.exists(image.name))
+        schedule.assert_not_called()
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_jobs_generate_in_request(self):
+        """Без воркеров миниатюра нарезается при первом рендере."""
+        post = Post.objects.create(
+            text='Text', author=self.user, image=make_image('eager.png')
+        )
+        image = get_thumbnail(post.image, self.geometry, **self.options)
+        self.assertNotIsInstance(image, thumbnails.Placeholder)
+        self.assertTrue(default.storage.exists(image.name))
+
+    def test_pregenerate_refreshes_cached_feeds(self):
+        """Фрагменты лент с заглушкой устаревают после нарезки."""
+        feeds = (
+            feed_cache.INDEX,
+            feed_cache.profile_feed(self.user.pk),
+            feed_cache.post_page(self.post.pk),
+        )
+        before = feed_cache.get_versions(*feeds)
+        thumbnails.pregenerate(self.post.image.name)
+        after = feed_cache.get_versions(*feeds)
+        for feed, old, new in zip(feeds, before, after):
+            with self.subTest(feed=feed):
+                self.assertNotEqual(old, new)
+
+    def test_feed_renders_placeholder(self):
+        """Лента не нарезает миниатюру в запросе."""
+        with mock.patch.object(
+            thumbnails.PregeneratedThumbnailBackend, 'generate'
+        ) as generate:
+            response = Client().get(reverse('posts:main_page'))
+        generate.assert_not_called()
+        self.assertContains(response, thumbnails.THUMBNAIL_PLACEHOLDER)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_EAGER=False)
+class ScheduleOnSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Dmitriy')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def thumbnail_jobs(self):
+        return list(Job.objects.filter(
+            task='posts.thumbnails.pregenerate'
+        ).values_list('key', flat=True))
+
+    def test_new_image_is_queued_with_post(self):
+        """Картинка нового поста уходит в очередь вместе с записью."""
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Text', 'image': make_image()},
+        )
+        post = Post.objects.get()
+        self.assertEqual(
+            self.thumbnail_jobs(), [f'thumbnail:{post.image.name}']
+        )
+
+    def test_edit_without_new_image_is_not_scheduled(self):
+        """Редактирование текста не перезапускает нарезку."""
+        post = Post.objects.create(
+            text='Text', author=self.user, image=make_image()
+        )
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Changed'},
+        )
+        self.assertEqual(self.thumbnail_jobs(), [])
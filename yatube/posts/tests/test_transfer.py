@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from .. import fulltext, transfer
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(
+            username='Dmitriy', first_name='Дмитрий'
+        )
+        self.reader = User.objects.create_user(
+            username='Reader', email='reader@example.com'
+        )
+        group = Group.objects.create(
+            title='Title', slug='test_slug', description='Description'
+        )
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            group=group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        for i in range(5):
+            Post.objects.create(text=f'Post number {i}', author=self.author)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export_and_wipe(self):
+        call_command('export_posts', self.directory, stdout=StringIO())
+        self.expected = {
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+            )),
+            'comments': list(Comment.objects.values_list(
+                'post__text', 'author__username', 'text', 'pub_date',
+            )),
+        }
+        self.expected_image = self.post.image.name
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, self.post.image.name))
+        User.objects.exclude(pk=self.author.pk).delete()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+
+    def import_posts(self, **options):
+        call_command(
+            'import_posts', self.directory, stdout=StringIO(), **options
+        )
+
+    def assert_restored(self):
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+            )),
+            self.expected['posts'],
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list(
+                'post__text', 'author__username', 'text', 'pub_date',
+            )),
+            self.expected['comments'],
+        )
+        self.assertTrue(
+            Follow.objects.filter(
+                user__username='Reader', author=self.author
+            ).exists()
+        )
+        self.assertEqual(
+            User.objects.get(username='Reader').email, 'reader@example.com'
+        )
+
+    def test_round_trip(self):
+        """Выгрузка загружается с сопоставлением авторов и групп."""
+        self.export_and_wipe()
+        self.import_posts(batch_size=2)
+        self.assert_restored()
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        # Производные данные пересобраны.
+        reader = User.objects.get(username='Reader')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 6
+        )
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.posts_count, 6
+        )
+        self.assertEqual(
+            list(fulltext.SearchPaginator('картинкой', 10).page()), [post]
+        )
+
+    def test_image_name_clash(self):
+        """Чужой файл под тем же именем не подменяет картинку поста."""
+        self.export_and_wipe()
+        name = self.expected_image
+        with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as other:
+            other.write(b'other')
+        self.import_posts()
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertNotEqual(post.image.name, name)
+        with post.image.open() as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+        # Та же картинка под тем же именем используется как есть.
+        with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as same:
+            same.write(SMALL_GIF)
+        importer = transfer.Importer(self.directory)
+        self.assertEqual(importer._import_image(name), name)
+
+    def test_orphaned_comments_skipped(self):
+        """Комментарий к незагруженному посту пропускается и считается."""
+        self.export_and_wipe()
+        path = os.path.join(self.directory, transfer.DATA_FILE)
+        with open(path, encoding='utf-8') as source:
+            lines = [json.loads(line) for line in source]
+        with open(path, 'w', encoding='utf-8') as partial:
+            for record in lines:
+                if record['type'] == 'post' and record['image']:
+                    continue
+                partial.write(json.dumps(record) + '\n')
+        importer = transfer.Importer(self.directory)
+        created = importer.run()
+        self.assertEqual(created['comment'], 0)
+        self.assertEqual(importer.orphaned, 1)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_interrupted_import_resumes(self):
+        """Повторный импорт дозагружает недостающее без дублей."""
+        self.export_and_wipe()
+        path = os.path.join(self.directory, transfer.DATA_FILE)
+        with open(path, encoding='utf-8') as source:
+            lines = source.readlines()
+        posts = [i for i, line in enumerate(lines)
+                 if json.loads(line)['type'] == 'post']
+        with open(path, 'w', encoding='utf-8') as partial:
+            partial.writelines(lines[:posts[3]])
+        self.import_posts(batch_size=2, skip_rebuild=True)
+        self.assertEqual(Post.objects.count(), 3)
+        with open(path, 'w', encoding='utf-8') as full:
+            full.writelines(lines)
+        self.import_posts(batch_size=2)
+        self.import_posts(batch_size=2)
+        self.assert_restored()
@@ -0,0 +1,135 @@
+import shutil
+import struct
+import tempfile
+import zlib
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+
+from .. import uploads
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_jpeg(size, exif=None):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, 'green')
+    if exif is not None:
+        image.save(buffer, format='JPEG', exif=exif)
+    else:
+        image.save(buffer, format='JPEG')
+    return SimpleUploadedFile(
+        name='photo.jpg', content=buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+def make_png_header(width, height):
+    """Только сигнатура и IHDR: размеры заявлены, пикселей нет."""
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data) & 0xffffffff
+        return struct.pack('>I', len(data)) + kind + data + struct.pack(
+            '>I', crc
+        )
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + b'\0' * 4096
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Dmitriy')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def post_image(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Картинка', 'image': image},
+        )
+
+    def test_oversized_file_rejected_while_streaming(self):
+        """Файл больше лимита отбрасывается, пост не создаётся."""
+        with mock.patch.object(uploads, 'IMAGE_UPLOAD_MAX_SIZE', 1024):
+            response = self.post_image(make_jpeg((200, 200)))
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+
+    def test_huge_dimensions_rejected_by_header(self):
+        """Картинка-бомба отклоняется по заголовку без декодирования."""
+        image = SimpleUploadedFile(
+            name='bomb.png',
+            content=make_png_header(30000, 30000),
+            content_type='image/png',
+        )
+        with mock.patch.object(ImageFile.ImageFile, 'load') as load:
+            response = self.post_image(image)
+        load.assert_not_called()
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+
+    def test_exif_stripped_and_side_capped(self):
+        """Сохранённая картинка без EXIF и не больше IMAGE_MAX_SIDE."""
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        with mock.patch.object(uploads, 'IMAGE_MAX_SIDE', 100):
+            self.post_image(make_jpeg((400, 200), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (100, 50))
+            self.assertNotIn('exif', saved.info)
+
+    def test_transparency_kept(self):
+        """Прозрачность палитры переживает удаление метаданных."""
+        image = Image.new('P', (40, 40), 0)
+        image.putpalette([255, 0, 0, 0, 0, 255] + [0] * 762)
+        image.paste(1, (0, 0, 20, 20))
+        buffer = BytesIO()
+        image.save(buffer, format='PNG', transparency=0)
+        with mock.patch.object(uploads, 'IMAGE_MAX_SIDE', 20):
+            self.post_image(SimpleUploadedFile(
+                'transparent.png', buffer.getvalue(), 'image/png'
+            ))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (20, 20))
+            self.assertEqual(saved.info.get('transparency'), 0)
+
+    def test_peak_decoded_size_bounded(self):
+        """JPEG декодируется сразу в уменьшенном масштабе."""
+        decoded = []
+        original_load = ImageFile.ImageFile.load
+
+        def load(image):
+            result = original_load(image)
+            decoded.append(image.size)
+            return result
+
+        max_side = 1000
+        with mock.patch.object(uploads, 'IMAGE_MAX_SIDE', max_side), \
+                mock.patch.object(ImageFile.ImageFile, 'load', load):
+            uploads.normalize_image(make_jpeg((4000, 3000)))
+        self.assertTrue(decoded)
+        for width, height in decoded:
+            self.assertLessEqual(width * height, (2 * max_side) ** 2)
+        self.assertLessEqual(
+            uploads.BYTES_PER_PIXEL * (2 * uploads.IMAGE_MAX_SIDE) ** 2,
+            uploads.PEAK_MEMORY
+        )
@@ -195,11 +195,8 @@ class PostPagesTests(TestCase):
         """Проверяем, что на главной странице работает кэш."""
         response = self.guest_user.get(reverse('posts:main_page'))
         content_old = response.content
-        Post.objects.create(
-            text='test cache index page',
-            author=self.user,
-            group=self.group
-        )
+        # update() не отправляет сигналов, поэтому кэш не сбрасывается
+        Post.objects.filter(pk=self.post.pk).update(text='changed')
         response = self.guest_user.get(reverse('posts:main_page'))
         self.assertEqual(response.content, content_old)
         cache.clear()
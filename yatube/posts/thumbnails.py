@@ -0,0 +1,107 @@
+"""Фоновая нарезка миниатюр картинок постов.
+
+sorl-thumbnail создаёт миниатюру при первом рендере шаблона, и декодирование
+картинки Pillow достаётся тому, кто первым открыл ленту после загрузки.
+Здесь миниатюры всех размеров из ``THUMBNAIL_PRESETS`` нарезаются
+воркерами ``run_workers`` сразу после сохранения поста, а шаблон до их
+готовности получает заглушку. Нарезка — фоновая задача ``core.jobs``
+с ключом по имени картинки, поэтому повторные рендеры не ставят
+в очередь дубли.
+"""
+from django.templatetags.static import static
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from yatube.settings import THUMBNAIL_PLACEHOLDER, THUMBNAIL_PRESETS
+
+from core import jobs
+
+from . import cache as feed_cache
+from .models import Post
+
+
+class Placeholder(DummyImageFile):
+    """Заглушка размера миниатюры, пока та нарезается в фоне."""
+
+    @property
+    def url(self):
+        return static(THUMBNAIL_PLACEHOLDER)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры, не нарезая их в запросе."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail = self._thumbnail_file(
+            file_, geometry_string, dict(options)
+        )
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if thumbnail.exists():
+            # Нарезана воркером задач: ключ в хранилище sorl мог остаться
+            # в кэше этого процесса пустым, достаточно записать его заново.
+            return super().get_thumbnail(file_, geometry_string, **options)
+        schedule(file_.name if hasattr(file_, 'name') else file_)
+        if jobs.is_eager():
+            # Без воркеров задача уже нарезала миниатюру в этом запросе.
+            return super().get_thumbnail(file_, geometry_string, **options)
+        return Placeholder(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        """Нарезает миниатюру синхронно — вызывается в воркере задач."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _thumbnail_file(self, file_, geometry_string, options):
+        # Те же опции по умолчанию, что и в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт с нарезанным в фоне.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+@jobs.task
+def pregenerate(name):
+    """Нарезает миниатюры всех размеров для картинки из хранилища."""
+    backend = default.backend
+    for geometry, options in THUMBNAIL_PRESETS:
+        backend.generate(name, geometry, **options)
+    _invalidate(name)
+
+
+def _invalidate(name):
+    # Фрагменты лент и ETag, собранные с заглушкой, живут FEED_CACHE_TTL:
+    # новое поколение лент с этой картинкой покажет готовую миниатюру.
+    feeds = []
+    for post_id, author_id, group_id in Post.objects.filter(
+        image=name
+    ).values_list('pk', 'author_id', 'group_id'):
+        feeds.append(feed_cache.post_page(post_id))
+        feeds.append(feed_cache.profile_feed(author_id))
+        if group_id is not None:
+            feeds.append(feed_cache.group_feed(group_id))
+    if feeds:
+        feed_cache.bump(feed_cache.INDEX, *feeds)
+
+
+def schedule(name):
+    """Ставит нарезку картинки в очередь задач.
+
+    Строка задачи пишется в транзакции сохранения поста: воркер увидит
+    её вместе с постом, а откат отменит и нарезку.
+    """
+    if name:
+        jobs.enqueue(pregenerate, [name], key=f'thumbnail:{name}')
@@ -0,0 +1,100 @@
+"""Лента подписок, материализованная при записи (fan-out on write).
+
+Вместо JOIN через Follow на каждый запрос ``follow_index`` читает готовые
+записи ``TimelineEntry`` подписчика. Записи раскладываются при публикации
+поста и при подписке, удаляются при отписке; удаление поста убирает их
+каскадом.
+
+Раскладка нового поста по лентам подписчиков — фоновая задача
+``deliver_post``: у популярного автора тысячи подписчиков, и запрос
+публикации их не ждёт. Она же ставит подписчикам уведомления в дайджест.
+Старые посты нового автора дозаполняет задача ``backfill_authors``,
+поэтому подписка в запросе — одна вставка ``Follow`` и строка задачи.
+"""
+from yatube.settings import TIMELINE_BATCH_SIZE
+
+from core import jobs
+
+from . import cache as feed_cache
+from . import notifications
+from .models import Follow, Post, TimelineEntry
+
+
+def fan_out_post(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@jobs.task
+def deliver_post(post_id):
+    """Задача: раскладывает пост по лентам и уведомляет подписчиков."""
+    post = Post.objects.filter(pk=post_id).select_related('author').first()
+    if post is not None:
+        fan_out_post(post)
+        notifications.notify_followers(post)
+
+
+def add_author(user_id, author_id):
+    """Дозаполняет ленту подписчика постами нового автора."""
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id, author_ids):
+    """Дозаполняет ленту подписчика постами сразу нескольких авторов."""
+    posts = Post.objects.filter(
+        author_id__in=author_ids
+    ).values_list('pk', 'author_id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@jobs.task
+def backfill_authors(user_id, author_ids):
+    """Задача: дозаполняет ленту подписчика постами новых авторов."""
+    # Подписку могли снять, пока задача ждала воркера.
+    author_ids = list(Follow.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+    if author_ids:
+        add_authors(user_id, author_ids)
+        # Валидаторы ленты подписок (api) видят только новые записи
+        # и поколение подписок, а дозаполненные посты старше.
+        feed_cache.bump(feed_cache.follows(user_id))
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    remove_authors(user_id, [author_id])
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из ленты подписчика посты нескольких авторов."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
@@ -0,0 +1,334 @@
+"""Перенос постов между окружениями в формате NDJSON.
+
+Экспорт пишет по строке JSON на объект — пользователи, группы, посты,
+комментарии, подписки, именно в таком порядке — и копирует картинки
+постов в ``<каталог>/media``. Строки читаются из базы через
+``iterator(chunk_size=...)``, поэтому в памяти нет всего набора данных.
+
+Импорт читает файл построчно и вставляет объекты пачками
+``bulk_create``. Авторы и группы сопоставляются по username и slug,
+посты — по паре (автор, ``pub_date``), комментарии — по посту, автору
+и ``pub_date``. Уже существующие объекты пропускаются, а каждая пачка
+фиксируется отдельной транзакцией, так что прерванный импорт
+достаточно запустить ещё раз.
+
+``bulk_create`` не шлёт сигналов, поэтому ленты подписок, счётчики
+и поисковый индекс после импорта пересобираются ``rebuild_derived``.
+``auto_now_add`` при вставке ставит текущее время, поэтому ``pub_date``
+постов и комментариев из выгрузки возвращается ``bulk_update`` в той же
+транзакции.
+"""
+import json
+import os
+import shutil
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import cache as feed_cache
+from . import counters, fulltext, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+DATA_FILE = 'posts.ndjson'
+MEDIA_DIR = 'media'
+# SQLite вставляет пачку одним составным SELECT, а в нём не больше
+# 500 частей.
+MAX_INSERT_ROWS = 500
+# Картинки сравниваются кусками по 64 КБ.
+CHUNK_SIZE = 64 * 1024
+# Модели, чей pub_date переносится из выгрузки.
+DATED_MODELS = (Post, Comment)
+
+
+def _export_rows(queryset, fields, chunk_size):
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def _copy_image(name, directory):
+    if not name:
+        return
+    target = os.path.join(directory, MEDIA_DIR, name)
+    if os.path.exists(target) or not default_storage.exists(name):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name) as source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+def export(directory, chunk_size=2000):
+    """Выгружает все посты в ``directory``. Возвращает число строк."""
+    os.makedirs(os.path.join(directory, MEDIA_DIR), exist_ok=True)
+    sources = (
+        ('user', User.objects, (
+            'username', 'email', 'first_name', 'last_name',
+        )),
+        ('group', Group.objects, ('slug', 'title', 'description')),
+        ('post', Post.objects, (
+            'author__username', 'group__slug', 'text', 'pub_date', 'image',
+        )),
+        ('comment', Comment.objects, (
+            'post__author__username', 'post__pub_date',
+            'author__username', 'text', 'pub_date',
+        )),
+        ('follow', Follow.objects, ('user__username', 'author__username')),
+    )
+    total = 0
+    path = os.path.join(directory, DATA_FILE)
+    with open(path, 'w', encoding='utf-8') as output:
+        for kind, manager, fields in sources:
+            for row in _export_rows(manager, fields, chunk_size):
+                record = _record(kind, row)
+                if kind == 'post':
+                    _copy_image(record['image'], directory)
+                output.write(json.dumps(record, ensure_ascii=False))
+                output.write('\n')
+                total += 1
+    return total
+
+
+def _record(kind, row):
+    if kind == 'user':
+        username, email, first_name, last_name = row
+        return {'type': kind, 'username': username, 'email': email,
+                'first_name': first_name, 'last_name': last_name}
+    if kind == 'group':
+        slug, title, description = row
+        return {'type': kind, 'slug': slug, 'title': title,
+                'description': description}
+    if kind == 'post':
+        author, group, text, pub_date, image = row
+        return {'type': kind, 'author': author, 'group': group,
+                'text': text, 'pub_date': pub_date.isoformat(),
+                'image': image or None}
+    if kind == 'comment':
+        post_author, post_date, author, text, pub_date = row
+        return {'type': kind, 'post': [post_author, post_date.isoformat()],
+                'author': author, 'text': text,
+                'pub_date': pub_date.isoformat()}
+    user, author = row
+    return {'type': kind, 'user': user, 'author': author}
+
+
+class Importer:
+    """Пачечный импорт выгрузки ``export``."""
+
+    def __init__(self, directory, batch_size=500):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.kind = None
+        self.batch = []
+        self.created = dict.fromkeys(
+            ('user', 'group', 'post', 'comment', 'follow'), 0
+        )
+        # Комментарии, чей пост или автор не загрузился.
+        self.orphaned = 0
+
+    def run(self):
+        path = os.path.join(self.directory, DATA_FILE)
+        with open(path, encoding='utf-8') as source:
+            for line in source:
+                if line.strip():
+                    self.add(json.loads(line))
+        self.flush()
+        return self.created
+
+    def add(self, record):
+        if record['type'] != self.kind or len(self.batch) >= self.batch_size:
+            self.flush()
+            self.kind = record['type']
+        self.batch.append(record)
+
+    def flush(self):
+        if not self.batch:
+            return
+        with transaction.atomic():
+            objects = getattr(self, f'_build_{self.kind}s')(self.batch)
+            if objects:
+                self._insert(type(objects[0]), objects)
+        self.created[self.kind] += len(objects)
+        self.batch = []
+
+    def _insert(self, model, objects):
+        dates = [getattr(obj, 'pub_date', None) for obj in objects]
+        model.objects.bulk_create(
+            objects, batch_size=min(self.batch_size, MAX_INSERT_ROWS)
+        )
+        if model not in DATED_MODELS:
+            return
+        if objects[0].pk is None:
+            # bulk_create в SQLite не возвращает id. Транзакция держит
+            # блокировку записи с первой вставки, так что строки пачки —
+            # последние в таблице, в порядке вставки.
+            pks = model.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            )[:len(objects)]
+            for obj, pk in zip(objects, reversed(pks)):
+                obj.pk = pk
+        for obj, pub_date in zip(objects, dates):
+            obj.pub_date = pub_date
+        model.objects.bulk_update(objects, ['pub_date'])
+
+    def _user_ids(self, usernames):
+        return dict(User.objects.filter(
+            username__in=set(usernames)
+        ).values_list('username', 'pk'))
+
+    def _build_users(self, records):
+        existing = self._user_ids(record['username'] for record in records)
+        return [
+            User(
+                username=record['username'],
+                # Без почты нельзя сбросить пароль; в старых выгрузках
+                # её нет.
+                email=record.get('email', ''),
+                first_name=record['first_name'],
+                last_name=record['last_name'],
+                # Пароли не переносятся: войти можно после сброса пароля.
+                password=make_password(None),
+            )
+            for record in records if record['username'] not in existing
+        ]
+
+    def _build_groups(self, records):
+        existing = set(Group.objects.filter(
+            slug__in=[record['slug'] for record in records]
+        ).values_list('slug', flat=True))
+        return [
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'],
+            )
+            for record in records if record['slug'] not in existing
+        ]
+
+    def _post_ids(self, keys):
+        """(author_id, pub_date) -> pk для уже сохранённых постов."""
+        author_ids = {author_id for author_id, _ in keys}
+        dates = {pub_date for _, pub_date in keys}
+        return {
+            (author_id, pub_date): pk
+            for author_id, pub_date, pk in Post.objects.filter(
+                author_id__in=author_ids, pub_date__in=dates
+            ).values_list('author_id', 'pub_date', 'pk')
+        }
+
+    def _build_posts(self, records):
+        users = self._user_ids(record['author'] for record in records)
+        groups = dict(Group.objects.filter(
+            slug__in={record['group'] for record in records}
+        ).values_list('slug', 'pk'))
+        posts = []
+        for record in records:
+            posts.append(Post(
+                author_id=users[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                image=record['image'] or '',
+            ))
+        existing = self._post_ids(
+            [(post.author_id, post.pub_date) for post in posts]
+        )
+        posts = [
+            post for post in posts
+            if (post.author_id, post.pub_date) not in existing
+        ]
+        for post in posts:
+            post.image = self._import_image(post.image.name)
+        return posts
+
+    def _import_image(self, name):
+        source = os.path.join(self.directory, MEDIA_DIR, name or '')
+        if not name or not os.path.isfile(source):
+            return ''
+        if self._same_file(name, source):
+            return name
+        # Под тем же именем лежит другая картинка — хранилище подберёт
+        # свободное имя.
+        with open(source, 'rb') as image:
+            return default_storage.save(name, File(image))
+
+    def _same_file(self, name, source):
+        if not default_storage.exists(name):
+            return False
+        if default_storage.size(name) != os.path.getsize(source):
+            return False
+        with default_storage.open(name) as stored, \
+                open(source, 'rb') as image:
+            while True:
+                left, right = stored.read(CHUNK_SIZE), image.read(CHUNK_SIZE)
+                if left != right:
+                    return False
+                if not left:
+                    return True
+
+    def _build_comments(self, records):
+        users = self._user_ids(
+            [record['author'] for record in records]
+            + [record['post'][0] for record in records]
+        )
+        post_keys = [
+            (users.get(record['post'][0]), parse_datetime(record['post'][1]))
+            for record in records
+        ]
+        post_ids = self._post_ids(post_keys)
+        comments = []
+        for record, post_key in zip(records, post_keys):
+            post_id = post_ids.get(post_key)
+            author_id = users.get(record['author'])
+            if post_id is None or author_id is None:
+                self.orphaned += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+            ))
+        existing = set(Comment.objects.filter(
+            post_id__in={comment.post_id for comment in comments},
+            pub_date__in={comment.pub_date for comment in comments},
+        ).values_list('post_id', 'author_id', 'pub_date'))
+        return [
+            comment for comment in comments
+            if (comment.post_id, comment.author_id, comment.pub_date)
+            not in existing
+        ]
+
+    def _build_follows(self, records):
+        users = self._user_ids(
+            [record['user'] for record in records]
+            + [record['author'] for record in records]
+        )
+        pairs = {
+            (users[record['user']], users[record['author']])
+            for record in records
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        return [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs - existing
+        ]
+
+
+def rebuild_derived():
+    """Ленты подписок, счётчики, поиск и кэш лент после пачечной вставки."""
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        timeline.add_author(user_id, author_id)
+    counters.recount()
+    fulltext.rebuild()
+    feed_cache.bump(feed_cache.SITE)
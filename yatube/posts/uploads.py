@@ -0,0 +1,152 @@
+"""Потоковая загрузка картинок постов с ранним отказом.
+
+Файл принимается частями прямо во временный файл (``FILE_UPLOAD_HANDLERS``
+без обработчика в памяти). ``ImageUploadHandler`` считает байты и по первым
+килобайтам разбирает заголовок картинки: слишком большой файл или картинка
+больших размеров отбрасываются до того, как загрузка закончится, и пиксели
+не декодируются вовсе. Принятая картинка пересохраняется без EXIF
+с длинной стороной не больше ``IMAGE_MAX_SIDE``.
+
+Пиковая память на одну загрузку — декодированная картинка, 4 байта
+на пиксель (Pillow хранит RGB как RGBX):
+
+* JPEG декодируется сразу в уменьшенном масштабе (``Image.draft``), так что
+  в памяти не больше ``(2 * IMAGE_MAX_SIDE) ** 2`` пикселей — 64 МБ;
+* остальные форматы декодируются целиком, не больше
+  ``IMAGE_UPLOAD_MAX_PIXELS`` пикселей — 96 МБ.
+
+Сам файл в памяти не держится: он лежит во временном файле.
+"""
+import warnings
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image, ImageOps
+
+from yatube.settings import (IMAGE_MAX_SIDE, IMAGE_UPLOAD_MAX_PIXELS,
+                             IMAGE_UPLOAD_MAX_SIDE, IMAGE_UPLOAD_MAX_SIZE)
+
+BYTES_PER_PIXEL = 4
+PEAK_MEMORY = BYTES_PER_PIXEL * max(
+    (2 * IMAGE_MAX_SIDE) ** 2,
+    IMAGE_UPLOAD_MAX_PIXELS,
+)
+# Дальше этого заголовок не ищем — проверку доделает форма.
+HEADER_LIMIT = 256 * 1024
+SAVE_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+# Ключи Image.info, которые переживают пересохранение.
+KEPT_INFO = ('transparency', 'duration', 'loop')
+
+
+def check_image_header(fileobj):
+    """Проверяет формат и размеры картинки только по заголовку.
+
+    ``Image.open`` читает заголовок и не трогает пиксели, поэтому проверка
+    стоит одинаково для картинки в 1 КБ и в 40 МБ.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            image = Image.open(fileobj)
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Слишком большое изображение', code='image_too_large'
+        )
+    width, height = image.size
+    if image.format not in SAVE_FORMATS:
+        raise ValidationError(
+            'Поддерживаются изображения JPEG, PNG, GIF и WebP',
+            code='image_format'
+        )
+    if (max(width, height) > IMAGE_UPLOAD_MAX_SIDE
+            or width * height > IMAGE_UPLOAD_MAX_PIXELS):
+        raise ValidationError(
+            f'Изображение {width}x{height} больше допустимого',
+            code='image_too_large'
+        )
+    return image
+
+
+def normalize_image(uploaded):
+    """Пересохраняет картинку без метаданных и в ограниченном размере."""
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    image_format = image.format
+    if getattr(image, 'is_animated', False):
+        # Анимацию не пересобираем: размеры уже проверены по заголовку,
+        # а в GIF нет EXIF.
+        uploaded.seek(0)
+        return uploaded
+    if image_format == 'JPEG':
+        image.draft('RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # Метаданные (EXIF, ICC, текстовые блоки) не переносим, а прозрачность
+    # палитры и тайминг GIF — часть самой картинки.
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key in KEPT_INFO
+    }
+    output = BytesIO()
+    image.save(output, format=image_format, optimize=True)
+    return SimpleUploadedFile(
+        name=uploaded.name,
+        content=output.getvalue(),
+        content_type=SAVE_FORMATS[image_format],
+    )
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Отбрасывает файл, как только он превысил лимит размера или его
+    заголовок показал недопустимую картинку.
+
+    Отклонённый файл пропускается (``SkipFile``): остальные поля формы
+    разбираются как обычно, а причина отказа остаётся в
+    ``request.upload_errors`` для формы.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        if not (self.content_type or '').startswith('image/'):
+            self.header = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > IMAGE_UPLOAD_MAX_SIZE:
+            limit = IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)
+            self._reject(f'Файл больше {limit} МБ')
+        if self.header is not None:
+            self._check_header(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def _check_header(self, raw_data):
+        self.header += raw_data
+        try:
+            check_image_header(BytesIO(self.header))
+        except ValidationError as error:
+            self._reject(error.messages[0])
+        except (OSError, SyntaxError):
+            # Заголовок ещё не пришёл целиком.
+            if len(self.header) < HEADER_LIMIT:
+                return
+        self.header = None
+
+    def _reject(self, message):
+        if not hasattr(self.request, 'upload_errors'):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+        raise SkipFile
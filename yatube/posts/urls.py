@@ -10,6 +10,11 @@ urlpatterns = [
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<post_id>/delete/', views.post_delete, name='post_delete'),
     path('posts/<post_id>/comment/', views.add_comment, name='add_comment'),
+    path(
+        'posts/<post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<post_id>/<comment_id>/delete/',
         views.delete_comment,
@@ -18,6 +23,13 @@ urlpatterns = [
     path('posts/<post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path(
+        'follow/suggestions/',
+        views.follow_suggestions,
+        name='follow_suggestions'
+    ),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_to_follow,
@@ -28,4 +40,14 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/followers/',
+        views.profile_followers,
+        name='profile_followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.profile_following,
+        name='profile_following'
+    ),
 ]
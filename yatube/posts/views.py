@@ -1,76 +1,187 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from yatube.settings import ENTRIES_PER_PAGE
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from yatube.settings import (COMMENTS_PER_PAGE, ENTRIES_PER_PAGE,
+                             FOLLOW_BULK_LIMIT)
 
+from . import cache as feed_cache
+from . import counters, follow_actions, follows, graph, thumbnails
+from .conditional import (anonymous_conditional, group_state, index_state,
+                          post_state, profile_state)
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
+from .fulltext import SearchPaginator
+from .models import TIMELINE_ORDERING, Comment, Group, Post
+from .page_cache import cache_anonymous_page
+from .paginators import CountedPaginator, KeysetPaginator
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, ENTRIES_PER_PAGE)
+def get_page_context(queryset, request, keyset=False, ordering=None,
+                     count=None, feed=None):
+    cursor = request.GET.get('cursor')
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Старые ссылки вида ?page=N продолжают работать через OFFSET.
+    if keyset and (cursor or not page_number):
+        paginator = KeysetPaginator(queryset, ENTRIES_PER_PAGE, ordering)
+        page_obj = paginator.get_page(cursor)
+    else:
+        # Число записей — из счётчика или кэша ленты, см. CountedPaginator.
+        paginator = CountedPaginator(
+            queryset.order_by(*(ordering or KeysetPaginator.default_ordering)),
+            ENTRIES_PER_PAGE,
+            count=count,
+            feed=feed,
+        )
+        page_obj = paginator.get_page(page_number)
     return {
         'page_obj': page_obj,
+        'followed_authors': follows.for_request(request),
     }
 
 
+@cache_anonymous_page
+@anonymous_conditional(index_state)
 def index(request):
-    context = get_page_context(Post.objects.all(), request)
+    context = get_page_context(
+        Post.objects.for_feed(), request, keyset=True, feed=feed_cache.INDEX
+    )
+    context.update(feed_cache.fragment_context(request, feed_cache.INDEX))
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page
+@anonymous_conditional(group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(
+        get_page_context(
+            group.posts.for_feed(), request, keyset=True,
+            count=group.posts_count,
+        )
+    )
+    context.update(feed_cache.fragment_context(
+        request, feed_cache.group_feed(group.pk)
+    ))
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page
+@anonymous_conditional(profile_state)
 def profile(request, username):
     # Здесь код запроса к модели и создание словаря контекста
-    profile = get_object_or_404(User, username=username)
-    posts_count = profile.posts.count()
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=profile).exists()
+    profile = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    stats = counters.user_stats(profile)
+    following = profile.pk in follows.for_request(request)
     context = {
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'profile': profile,
         'following': following
     }
-    context.update(get_page_context(profile.posts.all(), request))
+    context.update(
+        get_page_context(
+            profile.posts.for_feed(), request, keyset=True,
+            count=stats.posts_count,
+        )
+    )
+    context.update(feed_cache.fragment_context(
+        request, feed_cache.profile_feed(profile.pk)
+    ))
+    feed_cache.tag_page(request, feed_cache.profile_stats(profile.pk))
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments_page(post_id, cursor=None):
+    """Порция комментариев поста после курсора, новые — первыми."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only(
+        'text',
+        'pub_date',
+        'post_id',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+    )
+    return KeysetPaginator(comments, COMMENTS_PER_PAGE).get_page(cursor)
+
+
+@cache_anonymous_page
+@anonymous_conditional(post_state)
 def post_detail(request, post_id):
     # Здесь код запроса к модели и создание словаря контекста
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
+    posts_count = counters.user_stats(post.author).posts_count
     form = CommentForm()
     context = {
         'posts_count': posts_count,
         'post': post,
-        'post_id': post_id,
+        'post_id': post.pk,
         'form': form,
+        # Остальные комментарии страница подгружает из post_comments.
+        'comments': get_comments_page(post.pk),
     }
-    context.update(get_page_context(
-        post.comments.select_related('author'),
-        request
-    ))
+    # Число постов автора на странице меняется вместе с его лентой.
+    feed_cache.tag_page(
+        request, feed_cache.SITE, feed_cache.post_page(post.pk),
+        feed_cache.profile_feed(post.author_id),
+    )
     return render(request, 'posts/post_detail.html', context)
 
 
+def _comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+        'author': comment.author.username,
+        'author_name': comment.author.get_full_name(),
+    }
+
+
+@cache_anonymous_page
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или ``?format=json``."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = get_comments_page(post_id, request.GET.get('cursor'))
+    feed_cache.tag_page(
+        request, feed_cache.SITE, feed_cache.post_page(post_id)
+    )
+    if request.GET.get('format') != 'json':
+        return render(request, 'posts/includes/comments.html', {
+            'comments': comments,
+            'post_id': post_id,
+        })
+    next_url = None
+    if comments.next_cursor:
+        next_url = request.build_absolute_uri(
+            f'{request.path}?format=json&cursor={comments.next_cursor}'
+        )
+    return JsonResponse({
+        'results': [_comment_data(comment) for comment in comments],
+        'next': next_url,
+    })
+
+
 @login_required
 def post_delete(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user == post.author:
-        post.delete()
+        with transaction.atomic():
+            post.delete()
     return redirect('posts:profile', username=request.user.username)
 
 
@@ -78,11 +189,16 @@ def post_delete(request, post_id):
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None)
+        files=request.FILES or None,
+        upload_errors=getattr(request, 'upload_errors', None))
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Задачи сигналов (лента подписчиков, поиск, миниатюры) пишутся
+        # в очередь в одной транзакции с постом: фиксируются вместе.
+        with transaction.atomic():
+            post.save()
+            thumbnails.schedule(post.image.name)
         return redirect('posts:profile', username=request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -95,10 +211,14 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        upload_errors=getattr(request, 'upload_errors', None)
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/create_post.html',
                   {'form': form, 'is_edit': True})
@@ -112,7 +232,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id)
 
 
@@ -120,36 +241,129 @@ def add_comment(request, post_id):
 def delete_comment(request, post_id, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
     if request.user == comment.author:
-        comment.delete()
+        with transaction.atomic():
+            comment.delete()
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
 def follow_index(request):
-    context = get_page_context(Post.objects.filter(
-        author__following__user=request.user),
-        request
+    posts = Post.objects.for_timeline(request.user)
+    context = get_page_context(
+        posts, request, keyset=True, ordering=TIMELINE_ORDERING
     )
+    # В ленте подписок только авторы, на которых пользователь подписан.
+    context['followed_authors'] = {
+        post.author_id for post in context['page_obj']
+    }
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, ENTRIES_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def _users_in_order(user_ids):
+    users = User.objects.in_bulk(list(user_ids))
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+def _follow_list(request, username, kind):
+    """Страница подписчиков или подписок пользователя из графа подписок."""
+    profile = get_object_or_404(User, username=username)
+    if kind == graph.FOLLOWERS:
+        ids, backwards = graph.followers(profile.pk), graph.following
+    else:
+        ids, backwards = graph.following(profile.pk), graph.followers
+    # Число записей — длина списка из кэша, COUNT не нужен.
+    page_obj = CountedPaginator(
+        ids, ENTRIES_PER_PAGE, count=len(ids)
+    ).get_page(request.GET.get('page'))
+    # Взаимная подписка — связь в обратную сторону с владельцем профиля.
+    reverse_ids = backwards(profile.pk)
+    users = _users_in_order(list(page_obj))
+    for user in users:
+        user.is_mutual = user.pk in reverse_ids
+    context = {
+        'profile': profile,
+        'kind': kind,
+        'page_obj': page_obj,
+        'users': users,
+        'followed_authors': follows.for_request(request),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def profile_followers(request, username):
+    return _follow_list(request, username, graph.FOLLOWERS)
+
+
+def profile_following(request, username):
+    return _follow_list(request, username, graph.FOLLOWING)
+
+
+@login_required
+def follow_suggestions(request):
+    scores = dict(graph.suggestions(request.user.pk))
+    users = _users_in_order(list(scores))
+    for user in users:
+        user.common_follows = scores[user.pk]
+    return render(request, 'posts/follow_suggestions.html', {
+        'users': users,
+        'followed_authors': follows.for_request(request),
+    })
+
+
+def _author_exists(username):
+    if not User.objects.filter(username=username).exists():
+        raise Http404('Пользователь не найден')
+
+
 @login_required
 def profile_to_follow(request, username):
-    following_user = get_object_or_404(User, username=username)
-    user = request.user
-    if user != following_user:
-        Follow.objects.get_or_create(
-            user=user,
-            author=following_user
-        )
+    # Проверка нужна, только если ничего не изменилось: неизвестное
+    # имя пропускается командой без ошибки.
+    if not follow_actions.follow(request.user.pk, [username]):
+        _author_exists(username)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    user = request.user
-    author = get_object_or_404(User, username=username)
-    check_follow = Follow.objects.filter(user=user, author=author)
-    if check_follow.exists():
-        check_follow.delete()
+    if not follow_actions.unfollow(request.user.pk, [username]):
+        _author_exists(username)
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка или отписка сразу от многих авторов (онбординг).
+
+    Поля формы: ``username`` (повторяется) и ``action`` — ``follow``
+    или ``unfollow``. В ответе — изменившиеся авторы и новые счётчики.
+    """
+    usernames = request.POST.getlist('username')
+    action = request.POST.get('action', 'follow')
+    if action not in ('follow', 'unfollow'):
+        return JsonResponse({'detail': 'Неизвестное действие.'}, status=400)
+    if not usernames or len(usernames) > FOLLOW_BULK_LIMIT:
+        return JsonResponse(
+            {'detail': f'Нужно от 1 до {FOLLOW_BULK_LIMIT} имён.'},
+            status=400,
+        )
+    toggle = getattr(follow_actions, action)
+    changed = toggle(request.user.pk, usernames)
+    counts = follow_actions.counts(request.user.pk, changed)
+    return JsonResponse({
+        'changed': sorted(counts['followers']),
+        'following_count': counts['following_count'],
+        'followers_count': counts['followers'],
+    })
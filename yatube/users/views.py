@@ -7,7 +7,7 @@ from django.contrib.auth.views import (PasswordChangeDoneView,
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
-from .forms import CreationForm
+from .forms import CreationForm, OutboxPasswordResetForm
 
 
 class SignUp(CreateView):
@@ -26,6 +26,7 @@ class PasswordChangeDone(PasswordChangeDoneView):
 
 
 class PasswordReset(PasswordResetView):
+    form_class = OutboxPasswordResetForm
     success_url = reverse_lazy('users:password_reset_done')
     template_name = 'users/password_reset_form.html'
 
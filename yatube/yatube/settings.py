@@ -10,11 +10,24 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Прогон тестов пишет загруженные картинки, миниатюры и кэш в свой
+# временный каталог, который удаляется при выходе процесса, а не рядом
+# с рабочими данными сайта.
+TESTING = 'test' in sys.argv[1:2] or 'pytest' in sys.modules
+TEST_TEMP_DIR = None
+if TESTING:
+    TEST_TEMP_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, TEST_TEMP_DIR, ignore_errors=True)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -37,6 +50,7 @@ ALLOWED_HOSTS = [
 # Application definition
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'core.apps.CoreConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
@@ -51,6 +65,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,7 +83,7 @@ INTERNAL_IPS = [
 ROOT_URLCONF = 'yatube.urls'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.path.join(TEST_TEMP_DIR or BASE_DIR, 'media')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
@@ -94,12 +109,41 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Бэкенд и параметры берутся из окружения, по умолчанию — файл SQLite.
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
+DB_IS_SQLITE = DB_ENGINE == 'django.db.backends.sqlite3'
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        # Постоянные соединения вместо нового соединения на каждый запрос.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'TEST': {
+            # Тесты SQLite идут на файле с теми же прагмами, что и в работе:
+            # WAL в памяти не работает.
+            'NAME': os.getenv(
+                'DB_TEST_NAME',
+                os.path.join(BASE_DIR, 'test_db.sqlite3')
+                if DB_IS_SQLITE else None,
+            ),
+        },
     }
 }
+# Проверять постоянные соединения в начале каждого запроса. Включается
+# явно: соединение SQLite сервер не закрывает, и проверка лишь тратит
+# запрос к базе на каждый HTTP-запрос.
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS', '0') == '1'
+# Прагмы каждого нового соединения SQLite (core/db.py).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': int(os.getenv('DB_BUSY_TIMEOUT', 20000)),
+}
 
 
 # Password validation
@@ -145,12 +189,90 @@ LOGIN_REDIRECT_URL = 'posts:main_page'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Очередь писем (core/mail.py): пачка уходит через одно соединение,
+# получателю — не больше MAIL_RATE_LIMIT писем за MAIL_RATE_WINDOW секунд,
+# уведомления о новых постах копятся в дайджест MAIL_DIGEST_INTERVAL секунд.
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+MAIL_RATE_LIMIT = int(os.getenv('MAIL_RATE_LIMIT', 5))
+MAIL_RATE_WINDOW = int(os.getenv('MAIL_RATE_WINDOW', 60 * 60))
+MAIL_DIGEST_INTERVAL = int(os.getenv('MAIL_DIGEST_INTERVAL', 60 * 60))
+MAIL_DIGEST_SUBJECT = 'Новые посты авторов, на которых вы подписаны'
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+# Адрес сайта для ссылок в письмах, которые отправляются вне запроса.
+SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')
 ENTRIES_PER_PAGE = 10
+# Лента без фильтров длиннее этого числа постов нумеруется по оценке
+# из статистики таблицы, а не по COUNT(*) (posts/paginators.py).
+PAGINATOR_ESTIMATE_THRESHOLD = 100_000
+# Комментариев в первой порции на странице поста и в каждой подгрузке.
+COMMENTS_PER_PAGE = 20
+TIMELINE_BATCH_SIZE = 500
+# Сколько авторов можно подписать или отписать одним запросом follow/bulk/.
+FOLLOW_BULK_LIMIT = 100
+FEED_CACHE_TTL = 60 * 60 * 24
+# Сколько секунд прокси и браузер могут отдавать анонимам копию ленты
+# без перепроверки (posts/conditional.py).
+ANONYMOUS_CACHE_MAX_AGE = int(os.getenv('ANONYMOUS_CACHE_MAX_AGE', 60))
+# Срок жизни страницы в кэше анонимных страниц (posts/page_cache.py);
+# устаревшие страницы сбрасываются поколениями лент раньше.
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 60 * 60))
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Миниатюры нарезаются в фоне задачами core.jobs; при JOBS_EAGER —
+# в запросе, как делает sorl-thumbnail по умолчанию.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+THUMBNAIL_PRESETS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_PLACEHOLDER = 'img/thumbnail_placeholder.svg'
+
+# Загрузки пишутся во временный файл частями, в памяти файл не держится.
+# Ограничения см. в posts/uploads.py.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_MAX_SIDE = 10000
+IMAGE_UPLOAD_MAX_PIXELS = 24_000_000
+IMAGE_MAX_SIDE = 2048
+
+# Общий для воркеров кэш в файле SQLite (core/cache.py). Прежний кэш
+# в памяти процесса: CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache.
+# Тесты очищают кэш, поэтому каждый прогон получает свой файл во временном
+# каталоге, а не общий с запущенным сайтом.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'core.cache.SQLiteCache'),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(TEST_TEMP_DIR or BASE_DIR, 'cache.sqlite3'),
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 20000)),
+            'MAX_SIZE': int(os.getenv('CACHE_MAX_SIZE', 64 * 1024 * 1024)),
+        },
     }
 }
+
+# Замеры запросов (core/middleware.py): гистограммы по представлениям
+# на internal/metrics/ и журнал запросов дольше PERF_SLOW_REQUEST_MS
+# (0 — журнал выключен).
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', 0))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Заголовки Server-Timing и X-DB-Queries у страниц posts.views.
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+# Фоновые задачи (core/jobs.py) выполняют воркеры команды run_workers.
+# JOBS_EAGER=1 — выполнять задачи сразу в запросе; только явно, в том
+# числе в отладке, чтобы код без воркеров не проверялся незаметно.
+JOBS_EAGER = os.getenv('JOBS_EAGER', '0') == '1'
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+# Пауза перед первым повтором в секундах, дальше удваивается.
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+# Задача, взятая воркером дольше этого числа секунд назад, считается
+# брошенной и возвращается в очередь.
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 10 * 60))